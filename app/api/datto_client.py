@@ -1,21 +1,43 @@
 import requests
 import base64
+import random
+import threading
+import time
 import yaml
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
 
-from config.config import Config, load_sites
+from config.config import Config
+from api.token_manager import TokenManager
+from core import metrics
+from core.site_catalog import catalog
 
 def load_config():
     with open(Config.CONFIG_YAML, 'r') as f:
         return yaml.safe_load(f)
-    
-config = load_config()
 
-api_url = config["api"]["url"]
-api_key = config["api"]["key"]
-api_secret = config["api"]["secret"]
+# Read on first use rather than at import, so the app starts without a
+# config.yml and nothing touches the network until an API call is made
+_config = None
+_token_manager = None
+_lazy_lock = threading.RLock()
 
-def get_access_token(api_url, api_key, api_secret):
+def get_config():
+    global _config
+    with _lazy_lock:
+        if _config is None:
+            _config = load_config()
+        return _config
+
+def get_api_url():
+    return get_config()["api"]["url"]
+
+def request_access_token(api_url, api_key, api_secret):
+    """
+    Call the OAuth token endpoint and return its JSON (access_token, expires_in, ...).
+    """
     url = f"{api_url}/auth/oauth/token"
     data = {
         "username": api_key,
@@ -27,41 +49,184 @@ def get_access_token(api_url, api_key, api_secret):
         "Content-Type": "application/x-www-form-urlencoded"
     }
 
-    response = requests.post(url, data=data, headers=headers)
+    with metrics.timed("http_request_seconds", endpoint="oauth/token"):
+        response = requests.post(url, data=data, headers=headers, timeout=Config.API_TIMEOUT)
+    metrics.inc("http_responses_total", endpoint="oauth/token", status=response.status_code)
     response.raise_for_status()
-    return response.json()["access_token"]
+    return response.json()
 
-token = get_access_token(api_url, api_key, api_secret)
-headers = {"Authorization": f"Bearer {token}"}
+def get_access_token(api_url, api_key, api_secret):
+    return request_access_token(api_url, api_key, api_secret)["access_token"]
 
-def get_devices_for_site(site_name):
-    if site_name not in config["sites"]:
+def get_token_manager():
+    """
+    The shared TokenManager, created on first use. The token itself is
+    fetched on the first API call and refreshed before expiry.
+    """
+    global _token_manager
+    with _lazy_lock:
+        if _token_manager is None:
+            api = get_config()["api"]
+            _token_manager = TokenManager(
+                lambda: request_access_token(api["url"], api["key"], api["secret"]),
+                cache_path=Config.TOKEN_CACHE_PATH,
+                cache_key=f"{api['url']}|{api['key']}",
+                refresh_margin=Config.TOKEN_REFRESH_MARGIN,
+            )
+        return _token_manager
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Return the shared HTTP session, creating it on first use.
+    The connection pool is sized to API_MAX_WORKERS so concurrent callers
+    reuse keep-alive connections instead of opening one per request.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=Config.API_MAX_WORKERS, pool_maxsize=Config.API_MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+def _retry_delay(attempt, response=None):
+    # Honour Retry-After when the server sends one, otherwise back off exponentially with jitter.
+    # Either way a single wait is capped at API_MAX_BACKOFF, so a server asking
+    # for an hour can't park a job or batch thread for that long.
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), Config.API_MAX_BACKOFF)
+    delay = Config.API_BACKOFF_FACTOR * (2 ** attempt)
+    return min(delay + random.uniform(0, delay / 2), Config.API_MAX_BACKOFF)
+
+def _endpoint(url):
+    # Metric label for a URL: its fixed path segments, e.g. "site/devices" for
+    # /api/v2/site/<uid>/devices, so ids don't create a label value per device
+    path = urlsplit(url).path.split("/api/v2/", 1)[-1]
+    return "/".join(part for part in path.split("/") if part.isalpha()) or "other"
+
+def api_get(url, **kwargs):
+    """
+    GET a Datto API URL through the shared session.
+    429/5xx responses and connection errors are retried with backoff and a
+    401 triggers one re-authentication; anything else is raised straight away.
+    """
+    session = get_session()
+    token_manager = get_token_manager()
+    endpoint = _endpoint(url)
+    attempt = 0
+    reauthenticated = False
+    while True:
+        token = token_manager.get_token()
+        try:
+            with metrics.timed("http_request_seconds", endpoint=endpoint):
+                response = session.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=Config.API_TIMEOUT, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            metrics.inc("http_responses_total", endpoint=endpoint, status="error")
+            if attempt >= Config.API_MAX_RETRIES:
+                raise
+            metrics.inc("http_retries_total", endpoint=endpoint)
+            time.sleep(_retry_delay(attempt))
+            attempt += 1
+            continue
+
+        metrics.inc("http_responses_total", endpoint=endpoint, status=response.status_code)
+
+        # A revoked or expired token: log in again once, then retry immediately
+        if response.status_code == 401 and not reauthenticated:
+            reauthenticated = True
+            token_manager.invalidate(token)
+            continue
+
+        if response.status_code in RETRY_STATUS_CODES and attempt < Config.API_MAX_RETRIES:
+            metrics.inc("http_retries_total", endpoint=endpoint)
+            time.sleep(_retry_delay(attempt, response))
+            attempt += 1
+            continue
+
+        response.raise_for_status()
+        return response
+
+def iter_site_device_pages(site_name):
+    """
+    Yield a site's devices one page at a time, following pageDetails.nextPageUrl
+    until the API reports no further pages. Only one page is held at a time.
+    """
+    site = catalog.get(site_name)
+    if site is None:
         raise ValueError(f"Site '{site_name}' not found in config.yaml")
 
-    site_uid = config["sites"][site_name]["uid"]
-    url = f"{api_url}/api/v2/site/{site_uid}/devices"
+    site_uid = site["uid"]
+    url = f"{get_api_url()}/api/v2/site/{site_uid}/devices"
 
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    while url:
+        data = api_get(url).json()
+        if "devices" not in data:
+            raise ValueError("No devices found in API response.")
+
+        yield data["devices"]
+        url = (data.get("pageDetails") or {}).get("nextPageUrl")
+
+def iter_site_devices(site_name):
+    """
+    Yield a site's devices one by one across all pages.
+    """
+    for page in iter_site_device_pages(site_name):
+        yield from page
+
+def get_devices_for_site(site_name):
+    """
+    Return every device for a site, across all pages, as {"devices": [...]}.
+    Prefer iter_site_device_pages for large sites.
+    """
+    return {"devices": list(iter_site_devices(site_name))}
 
 def get_device_audit(device_uid):
     """
     Fetch audit details for a specific device based on its UID.
     """
-    url = f"{api_url}/api/v2/audit/device/{device_uid}"
+    url = f"{get_api_url()}/api/v2/audit/device/{device_uid}"
 
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return response.json()
+    return api_get(url).json()
 
-def get_sites(api_url, token):
-    url = f"{api_url}/api/v2/account/sites"
+def get_device_audits(devices, max_workers=None):
+    """
+    Fetch audits for many devices concurrently over the shared session.
+    Accepts the device dicts from get_devices_for_site (or bare UIDs).
+    Returns (audits, failures): audits maps UID to audit JSON, failures maps
+    UID to the error message for devices that could not be fetched, so one
+    bad device never aborts the rest of the site.
+    """
+    uids = [device["uid"] if isinstance(device, dict) else device for device in devices]
+    max_workers = max_workers or Config.API_MAX_WORKERS
 
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
+    audits = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(get_device_audit, uid): uid for uid in uids}
+        for future in as_completed(futures):
+            uid = futures[future]
+            try:
+                audits[uid] = future.result()
+            except Exception as e:
+                print(f"Failed to fetch audit for device {uid}: {e}")
+                failures[uid] = str(e)
+
+    return audits, failures
+
+def get_sites():
+    url = f"{get_api_url()}/api/v2/account/sites"
 
-    data = response.json()
+    data = api_get(url).json()
 
     if "sites" not in data:
         raise KeyError(f"'sites' key not found in response: {data}")
@@ -69,24 +234,33 @@ def get_sites(api_url, token):
     return data["sites"]
 
 def populate_sites():
+    global _config
     if not os.path.exists(Config.CONFIG_YAML):
         raise FileNotFoundError(f"Could not find config at {Config.CONFIG_YAML}")
 
     with open(Config.CONFIG_YAML, "r") as f:
         config = yaml.safe_load(f)
 
-    sites = get_sites(api_url, token)
+    sites = get_sites()
 
     sorted_sites = sorted(sites, key=lambda site: site["name"])
 
-    config["sites"] = {
+    sites = {
         site["name"]: {"uid": site["uid"]}
         for site in sorted_sites
     }
+    # Leave the file (and its mtime, which the site catalog watches) alone when nothing changed
+    if config.get("sites") == sites:
+        return False
+    config["sites"] = sites
 
-    with open(Config.CONFIG_YAML, "w") as f:
+    # Written to a temporary file and swapped in, so readers never see half a file
+    temp_path = f"{Config.CONFIG_YAML}.tmp"
+    with open(temp_path, "w") as f:
         yaml.dump(config, f, sort_keys=False)
+    os.replace(temp_path, Config.CONFIG_YAML)
 
-def initialize_sites():
-    if not os.path.exists('config/config.yml') or not load_sites():
-        populate_sites()
\ No newline at end of file
+    # Pick up the new site list on the next API call
+    with _lazy_lock:
+        _config = config
+    return True
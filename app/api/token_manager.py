@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+class TokenManager:
+    """
+    Lazily fetches and caches an OAuth access token.
+
+    The token is requested on first use rather than at import, refreshed
+    `refresh_margin` seconds before it expires, and optionally persisted to
+    `cache_path` so a restarted process can reuse it. Concurrent callers that
+    find the token stale share a single refresh instead of each logging in.
+    """
+    def __init__(self, fetch_token, cache_path=None, cache_key="", refresh_margin=300):
+        """
+        fetch_token: callable returning the token endpoint's JSON
+                     (must contain access_token, may contain expires_in).
+        cache_key:   identifies the credentials, so a cached token is never
+                     reused against a different account or API URL.
+        """
+        self._fetch_token = fetch_token
+        self._cache_path = cache_path
+        self._cache_key = hashlib.sha256(cache_key.encode("utf-8")).hexdigest()
+        self._refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+        self._loaded_from_disk = False
+
+    def _is_fresh(self):
+        return self._token is not None and time.time() < self._expires_at - self._refresh_margin
+
+    def get_token(self):
+        if self._is_fresh():
+            return self._token
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if not self._loaded_from_disk:
+                self._loaded_from_disk = True
+                self._load_from_disk()
+            if not self._is_fresh():
+                self._refresh()
+            return self._token
+
+    def invalidate(self, token=None):
+        """
+        Drop the cached token, e.g. after the API answers 401.
+        Passing the rejected token avoids discarding one another thread has
+        already refreshed.
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def _refresh(self):
+        payload = self._fetch_token()
+        self._token = payload["access_token"]
+        # Datto tokens are long lived; assume an hour if the server omits expires_in
+        self._expires_at = time.time() + float(payload.get("expires_in", 3600))
+        self._save_to_disk()
+
+    def _load_from_disk(self):
+        if not self._cache_path or not os.path.exists(self._cache_path):
+            return
+        try:
+            with open(self._cache_path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable token cache {self._cache_path}: {e}")
+            return
+        if cached.get("key") == self._cache_key:
+            self._token = cached.get("access_token")
+            self._expires_at = float(cached.get("expires_at", 0))
+
+    def _save_to_disk(self):
+        if not self._cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._cache_path), exist_ok=True)
+            tmp_path = f"{self._cache_path}.tmp"
+            # Owner-only permissions; the file holds a bearer token
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"key": self._cache_key, "access_token": self._token, "expires_at": self._expires_at}, f)
+            os.replace(tmp_path, self._cache_path)
+        except OSError as e:
+            print(f"Could not write token cache {self._cache_path}: {e}")
@@ -1,14 +1,30 @@
-from flask import Flask, render_template, request
+from flask import Flask, Request, Response, abort, g, jsonify, render_template, request, send_file, url_for
+from werkzeug.utils import secure_filename
+import gzip
 import os
-import pdfplumber
-import camelot
-import sqlite3
+import shutil
+import time
 
 # Import configuration and other modules
-from config.config import Config
+from config.config import Config, site_db_path
 from api.datto_client import *
-from core.extractor_dispatcher import get_extractor
-from core.database import create_tables, insert_device_from_api
+from core import metrics, queries, snapshots
+from core.database import connect
+from core.jobs import JobManager
+from core.pdf_tables import open_pdf
+from core.pipeline import SITE_STAGES, run_site_report
+from core.site_catalog import catalog as site_catalog
+from core.uploads import UploadStream, remove_stale, save_upload
+
+class UploadRequest(Request):
+    """
+    Streams uploaded files to disk in chunks, hashing them on the way (see
+    core.uploads), instead of werkzeug's in-memory/temporary-file spooling.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        stream = UploadStream(app.config['UPLOAD_FOLDER'])
+        g.setdefault('uploads', []).append(stream)
+        return stream
 
 # Define template and static folder paths
 app = Flask(
@@ -19,67 +35,283 @@ app = Flask(
 
 # Load configuration from config.py
 app.config.from_object(Config)
+app.request_class = UploadRequest
 
 # Ensure temp dir exists
 os.makedirs(app.config['TEMP_FOLDER'], exist_ok=True)
 
-# Reset the database and drop all tables each time this is run
-def reset_database():
-    os.makedirs(os.path.dirname(app.config['DB_PATH']), exist_ok=True)
-
-    with sqlite3.connect(app.config['DB_PATH']) as conn:
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = OFF;")
-        
-        for table in [
-            "devices", "hardware", "storage", "software", "monitoring",
-            "security_events", "backups", "device_health",
-            "patch_management", "lifecycle"
-        ]:
-            cursor.execute(f"DROP TABLE IF EXISTS {table};")
-        
-        conn.commit()
-        create_tables(conn)
-
-# Clear DB at app start
-reset_database()
+# Site runs happen in the background; requests only queue them
+jobs = JobManager(max_workers=app.config['JOB_WORKERS'], history=app.config['JOB_HISTORY'])
+
+def profile_requested():
+    # ?profile=1 (or a form field) runs the job under cProfile
+    return request.values.get('profile', '').lower() in ('1', 'true', 'yes')
+
+_last_sweep = 0.0
+
+def sweep_stale_uploads():
+    # At most hourly: uploads and job folders left behind by a crash or restart
+    global _last_sweep
+    if time.time() - _last_sweep < 3600:
+        return
+    _last_sweep = time.time()
+    for folder in (app.config['UPLOAD_FOLDER'], app.config['JOB_UPLOAD_FOLDER']):
+        remove_stale(folder, app.config['UPLOAD_MAX_AGE'])
+
+def has_uploads():
+    return any(file and file.filename for file in request.files.getlist('file'))
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+
+def submit_site_job(site, uploaded_files, profile=False):
+    """
+    Move the uploads into a per-job folder and queue the site run.
+    Returns (job, created); an already active job for the site is reused.
+    Raises ValueError, before anything is queued, for a file that isn't a PDF.
+    """
+    sweep_stale_uploads()
+    upload_dir = os.path.join(app.config['JOB_UPLOAD_FOLDER'], os.urandom(8).hex())
+    pdf_paths = []
+    pdf_hashes = {}
+    try:
+        for index, file in enumerate(uploaded_files):
+            if not file or not file.filename:
+                continue
+            if not allowed_file(file.filename):
+                raise ValueError(f"{file.filename} is not a PDF")
+            # One folder per file, so two uploads with the same name can't collide
+            path = os.path.join(upload_dir, str(index), secure_filename(file.filename))
+            sha256, is_pdf = save_upload(file, path)
+            if not is_pdf:
+                raise ValueError(f"{file.filename} is not a PDF")
+            pdf_paths.append(path)
+            pdf_hashes[path] = sha256
+    except ValueError:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise
+
+    job, created = jobs.submit(site, SITE_STAGES, run_site_report, site, pdf_paths,
+                               cleanup_dir=upload_dir, profile=profile, pdf_hashes=pdf_hashes)
+    if not created:
+        # The running job keeps its own files; drop this request's copies
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    return job, created
+
+@app.teardown_request
+def discard_uploads(exception):
+    # Uploads no job claimed (rejected, failed or duplicate requests)
+    for stream in g.pop('uploads', []):
+        stream.discard()
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    message = f"Upload too large; the limit is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB per request"
+    if request.path.startswith('/jobs'):
+        return jsonify({"error": message}), 413
+    return render_template('index.html', selected_site='', job_id=None, error=message), 413
+
+@app.before_request
+def start_site_refresh():
+    # Started by the first request rather than at startup; a no-op once running.
+    # An empty catalog (first run) is filled from the API straight away.
+    site_catalog.start_refresh(app.config['SITE_REFRESH_INTERVAL'], populate_sites)
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    all_text = []
-    all_tables_html = []
-    sites = load_sites()
-    api_json_output = {}
+    job_id = None
+    error = None
 
     if request.method == 'POST':
-        uploaded_files = request.files.getlist('file')
         selected_site = request.form.get('site')
 
         if not selected_site:
-            return render_template('index.html', sites=sites, selected_site='', api_json=api_json_output)
+            return render_template('index.html', selected_site='', job_id=None, error=None)
+        if selected_site not in site_catalog:
+            error = f"Unknown site '{selected_site}'"
+        else:
+            # Queue the Datto fetch, DB sync and PDF parsing; the page polls for progress
+            try:
+                job, created = submit_site_job(selected_site, request.files.getlist('file'), profile_requested())
+                job_id = job.id
+                if not created and has_uploads():
+                    # The page follows the run already in progress, which has its own files
+                    error = (f"A run for {selected_site} is already in progress, so the uploaded PDFs were not "
+                             "processed. Upload them again once it has finished.")
+            except ValueError as e:
+                error = str(e)
+
+    return render_template('index.html', selected_site=request.form.get('site', ''), job_id=job_id, error=error)
 
-        reset_database()
+@app.route('/sites')
+def search_sites():
+    """
+    Sites matching ?q= (prefix, word prefix, then substring), for the site picker.
+    """
+    limit = min(request.args.get('limit', app.config['SITE_SEARCH_LIMIT'], type=int), 100)
+    sites, total = site_catalog.search(request.args.get('q', ''), limit)
+    return jsonify({"sites": sites, "total": total})
 
-        # Step 1–3: Fetch and insert Datto site + device audit info
-        api_json_output = get_devices_for_site(selected_site)
-        if "devices" not in api_json_output:
-            raise ValueError("No devices found in API response.")
+def site_db(site):
+    """
+    Connection to a site's database for this request, opened on first use
+    and closed when the request ends. 404s for unknown or never-synced sites.
+    """
+    if site not in site_catalog:
+        abort(404, description=f"Unknown site '{site}'")
+    connections = g.setdefault('site_dbs', {})
+    if site not in connections:
+        db_path = site_db_path(site)
+        if not os.path.exists(db_path):
+            abort(404, description=f"No data for '{site}' yet; run the site first")
+        conn = connect(db_path)
+        connections[site] = conn
+        # The view is created after the first ingest finishes
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'device_overview'").fetchone():
+            abort(404, description=f"No data for '{site}' yet; run the site first")
+    return connections[site]
 
-        with sqlite3.connect(app.config['DB_PATH']) as conn:
-            for device in api_json_output["devices"]:
-                insert_device_from_api(conn, device)
+@app.teardown_appcontext
+def close_site_dbs(exception):
+    for conn in g.pop('site_dbs', {}).values():
+        conn.close()
 
-    return render_template('index.html', sites=sites, selected_site=request.form.get('site', ''), api_json=api_json_output)
+@app.route('/sites/<path:site>/devices')
+def site_devices(site):
+    """
+    A page of the site's devices. Query parameters: after (the previous
+    page's `next`), limit, fields (comma separated), q, patch_status and
+    antivirus (a product or 'missing').
+    """
+    fields = request.args.get('fields')
+    try:
+        page = queries.browse_devices(
+            site_db(site),
+            after=request.args.get('after', 0, type=int),
+            limit=request.args.get('limit', app.config['DEVICE_PAGE_SIZE'], type=int),
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None,
+            search=request.args.get('q'),
+            patch_status=request.args.get('patch_status'),
+            antivirus=request.args.get('antivirus'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if page["next"] is not None:
+        page["next_url"] = url_for('site_devices', site=site, **{**request.args.to_dict(), "after": page["next"]})
+    return jsonify(page)
+
+@app.route('/sites/<path:site>/devices/<int:device_id>')
+def site_device(site, device_id):
+    record = queries.device_record(site_db(site), device_id)
+    if record is None:
+        return jsonify({"error": "Unknown device"}), 404
+    return jsonify(record)
+
+@app.route('/sites/<path:site>/summary')
+def site_summary(site):
+    conn = site_db(site)
+    return jsonify({
+        "patch_compliance": queries.patch_compliance(conn),
+        "antivirus": queries.antivirus_coverage(conn),
+        "warranty": queries.warranty_buckets(conn),
+    })
+
+@app.route('/sites/<path:site>/trends')
+def site_trend(site):
+    """
+    Month-over-month history from the site's snapshots (?months=, default 12).
+    """
+    if site not in site_catalog:
+        return jsonify({"error": f"Unknown site '{site}'"}), 404
+    return jsonify(snapshots.site_trends(site, request.args.get('months', app.config['TREND_MONTHS'], type=int)))
+
+@app.errorhandler(404)
+def not_found(error):
+    if request.path.startswith('/sites/'):
+        return jsonify({"error": error.description}), 404
+    return error
+
+@app.after_request
+def gzip_response(response):
+    # Compress JSON bodies for clients that accept it; small ones aren't worth it
+    if (response.mimetype != 'application/json' or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+    data = response.get_data()
+    if len(data) < app.config['GZIP_MIN_SIZE']:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=app.config['GZIP_LEVEL']))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    site = request.form.get('site')
+    if not site:
+        return jsonify({"error": "site is required"}), 400
+    if site not in site_catalog:
+        return jsonify({"error": f"Unknown site '{site}'"}), 404
+
+    try:
+        job, created = submit_site_job(site, request.files.getlist('file'), profile_requested())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    body = {
+        "job_id": job.id,
+        "deduplicated": not created,
+        "status_url": url_for('job_status', job_id=job.id),
+        "result_url": url_for('job_result', job_id=job.id),
+    }
+    if not created and has_uploads():
+        # Uploads can't join a run that has already started; the client should retry after it
+        return jsonify({**body, "error": f"A run for {site} is already in progress; the uploaded PDFs were not processed"}), 409
+    return jsonify(body), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.active:
+        return jsonify({"status": job.status}), 202
+    if job.error:
+        return jsonify({"status": job.status, "error": job.error}), 500
+    return jsonify({"status": job.status, "result": job.result})
+
+@app.route('/jobs/<job_id>/report')
+def job_report(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    report = (job.result or {}).get("report")
+    if not report or not os.path.exists(report):
+        return jsonify({"error": "No report for this job"}), 404
+    return send_file(report, as_attachment=True, download_name=os.path.basename(report))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 def extract_text_with_pdfplumber(pdf_path):
-    text = ""
-    with pdfplumber.open(pdf_path) as pdf:
+    import pdfplumber
+
+    pages = []
+    with open_pdf(pdf_path) as data, pdfplumber.open(data) as pdf:
         for page in pdf.pages[1:]:  # Skip cover page
             page_text = page.extract_text()
             if page_text:
-                text += page_text + "\n\n"
-    return text.strip()
+                pages.append(page_text)
+            page.close()  # release the page's parsed layout as we go
+    return "\n\n".join(pages).strip()
 
 if __name__ == "__main__":
-    initialize_sites()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Build every site's dataset in one unattended run.
+
+    python app/batch.py                      # every site in config.yml
+    python app/batch.py --sites "Acme*" --workers 8
+    python app/batch.py --refresh-sites --exclude "Test*"
+
+Sites run in parallel on a thread pool. They share the client's single
+OAuth token and pooled HTTP session, and each writes to its own database
+under Config.SITE_DB_FOLDER.
+"""
+import argparse
+import fnmatch
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.config import Config, load_sites, site_db_path
+from api.datto_client import populate_sites
+from core import metrics
+from core.pipeline import sync_site_devices
+
+def select_sites(sites, include=None, exclude=None):
+    """
+    Filter site names by shell-style patterns (case-insensitive).
+    """
+    def matches(site, patterns):
+        return any(fnmatch.fnmatch(site.lower(), pattern.lower()) for pattern in patterns)
+
+    if include:
+        sites = [site for site in sites if matches(site, include)]
+    if exclude:
+        sites = [site for site in sites if not matches(site, exclude)]
+    return sites
+
+def run_site(site):
+    start = time.perf_counter()
+    with metrics.track_run("batch_site", site=site):
+        summary = sync_site_devices(site, site_db_path(site))
+    return {**summary, "seconds": time.perf_counter() - start}
+
+def run_batch(sites, workers):
+    """
+    Process sites concurrently. Returns {site: summary or {"error": ...}}.
+    A failing site is reported and does not stop the others.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_site, site): site for site in sites}
+        for future in as_completed(futures):
+            site = futures[future]
+            try:
+                results[site] = future.result()
+                print(f"[ok]     {site}: {results[site]['devices']} devices in {results[site]['seconds']:.1f}s")
+            except Exception as e:
+                results[site] = {"error": str(e)}
+                print(f"[failed] {site}: {e}")
+    return results
+
+def print_summary(results, elapsed):
+    done = {site: result for site, result in results.items() if "error" not in result}
+    devices = sum(result["devices"] for result in done.values())
+    changed = {key: sum(result.get(key, 0) for result in done.values()) for key in ("inserted", "updated", "unchanged", "deleted")}
+
+    print()
+    print(f"Sites:      {len(done)} ok, {len(results) - len(done)} failed")
+    print(f"Devices:    {devices} ({', '.join(f'{count} {key}' for key, count in changed.items())})")
+    print(f"Wall time:  {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput: {len(done) / elapsed:.2f} sites/s, {devices / elapsed:.0f} devices/s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build every site's dataset in parallel.")
+    parser.add_argument("--sites", nargs="*", help="site names or patterns to include (default: all)")
+    parser.add_argument("--exclude", nargs="*", help="site names or patterns to skip")
+    parser.add_argument("--workers", type=int, default=Config.API_MAX_WORKERS, help="sites processed at once")
+    parser.add_argument("--refresh-sites", action="store_true", help="re-populate config.yml from the API first")
+    args = parser.parse_args(argv)
+
+    if args.refresh_sites:
+        populate_sites()
+
+    sites = select_sites(load_sites(), args.sites, args.exclude)
+    if not sites:
+        print("No sites selected.")
+        return 1
+
+    print(f"Processing {len(sites)} sites with {args.workers} workers")
+    start = time.perf_counter()
+    results = run_batch(sites, args.workers)
+    print_summary(results, time.perf_counter() - start)
+    return 0 if all("error" not in result for result in results.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,68 @@
+import os
 import sqlite3
 import datetime
+from contextlib import contextmanager
+
+from core import metrics
+from core.models import DeviceRecord
+
+# Connection pragmas for bulk loads: WAL keeps readers unblocked while we write,
+# NORMAL sync is still crash-safe under WAL, and a larger page cache (negative = KiB)
+# keeps index pages hot across a big batch.
+BULK_PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -65536;",
+    "PRAGMA temp_store = MEMORY;",
+)
+
+def tune_for_bulk_load(conn):
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+
+def connect(db_path, timeout=30):
+    """
+    Open a connection for one thread's unit of work.
+    WAL lets readers (report queries, the web UI) keep reading while an ingest
+    writes, and the busy timeout makes a second writer wait rather than fail.
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)};")
+    return conn
+
+@contextmanager
+def open_database(db_path):
+    """
+    Connection that is always closed afterwards. sqlite3's own context manager
+    only commits, which leaves connections (and WAL files) open until GC.
+    """
+    conn = connect(db_path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def write_transaction(conn):
+    """
+    Run the block in a BEGIN IMMEDIATE transaction, committed at the end and
+    rolled back on error. The write lock is taken before the first read, so
+    what the block reads (existing uids, MAX(id)) can't be changed by another
+    process writing the same file before its own writes land. Inside a
+    transaction the caller already holds, the block just joins it.
+    """
+    if conn.in_transaction:
+        yield
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
 
 def create_tables(conn):
     try:
@@ -147,6 +210,23 @@ def create_tables(conn):
         );
         """)
 
+        # Content hashes used by incremental sync, one per device and child table
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS row_hashes (
+            device_id INTEGER NOT NULL,
+            table_name TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (device_id, table_name),
+            FOREIGN KEY (device_id) REFERENCES devices(id)
+        );
+        """)
+
+        # Databases created by earlier versions lack the columns added since
+        for table, column, column_type in ADDED_COLUMNS:
+            columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table});")]
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type};")
+
         conn.commit()
 
     except sqlite3.Error as e:
@@ -154,79 +234,198 @@ def create_tables(conn):
     finally:
         cursor.close()
 
+# Columns added to existing tables, as (table, column, type): the device hash
+# used by incremental sync and the PDF values kept for API_PDF_FALLBACKS
+ADDED_COLUMNS = (
+    ("devices", "content_hash", "TEXT"),
+    ("devices", "pdf_serial_number", "VARCHAR"),
+    ("software", "pdf_antivirus", "VARCHAR"),
+    ("lifecycle", "pdf_warranty_date", "VARCHAR"),
+)
+
+# Every table, dropped by reset_database
+ALL_TABLES = [
+    "devices", "hardware", "storage", "software", "monitoring",
+    "security_events", "backups", "device_health",
+    "patch_management", "lifecycle", "udfs", "row_hashes"
+]
+
+def reset_database(db_path):
+    """
+    Drop and recreate every table.
+    """
+    with open_database(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA foreign_keys = OFF;")
+
+        for table in ALL_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table};")
+
+        conn.commit()
+        create_tables(conn)
+
+def init_database(db_path):
+    """
+    Create any missing tables, keeping existing data for incremental sync.
+    """
+    with open_database(db_path) as conn:
+        create_tables(conn)
+
+@metrics.timed("sql_batch_seconds", operation="insert_device")
 def insert_device_from_api(conn, api_data):
+    device = DeviceRecord.from_api(api_data)
     cursor = conn.cursor()
 
     # Insert into devices
-    cursor.execute("""
-        INSERT OR IGNORE INTO devices (uid, name, description, last_user, domain, os_version, serial_number)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (
-        api_data.get("uid"),
-        api_data.get("hostname"),
-        api_data.get("description"),
-        api_data.get("lastLoggedInUser"),
-        api_data.get("domain"),
-        api_data.get("operatingSystem"),
-        api_data.get("serialNumber"),  # If serial number is available in the API, include it.
-    ))
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO devices ({", ".join(API_DEVICE_COLUMNS)})
+        VALUES ({", ".join("?" * len(API_DEVICE_COLUMNS))})
+    """, _device_row(device))
 
     # Get device ID
-    cursor.execute("SELECT id FROM devices WHERE uid = ?", (api_data.get("uid"),))
+    cursor.execute("SELECT id FROM devices WHERE uid = ?", (device.uid,))
     row = cursor.fetchone()
     if not row:
-        print(f"Failed to fetch device ID for UID: {api_data.get('uid')}")
+        print(f"Failed to fetch device ID for UID: {device.uid}")
         return
     device_id = row[0]
 
-    # Insert into software (including antivirus and software status)
-    cursor.execute("""
-        INSERT INTO software (device_id, antivirus, software_status)
-        VALUES (?, ?, ?)
-    """, (
-        device_id,
-        api_data.get("antivirus", {}).get("antivirusProduct"),
-        api_data.get("softwareStatus"),
-    ))
-
-    # Insert patch management info
-    cursor.execute("""
+    # Software, patch management, monitoring, lifecycle and UDF rows
+    for table, rows in _child_rows(device_id, device).items():
+        cursor.executemany(API_CHILD_INSERTS[table], rows)
+
+    conn.commit()
+    cursor.close()
+
+API_DEVICE_COLUMNS = ("uid", "name", "description", "last_user", "domain", "os_version", "serial_number")
+
+def _device_row(device):
+    """
+    Values for the devices table columns in API_DEVICE_COLUMNS order.
+    """
+    return (device.uid, device.name, device.description, device.last_user, device.domain, device.os_version, device.serial_number)
+
+def _child_rows(device_id, device):
+    """
+    Build the child-table rows the API sync owns for one DeviceRecord, keyed by table name.
+    """
+    return {
+        "software": [(device_id, device.antivirus, device.software_status)],
+        "patch_management": [(
+            device_id,
+            device.patch_status,
+            device.patches_approved_pending,
+            device.patches_not_approved,
+            device.patches_installed,
+        )],
+        "monitoring": [(device_id, device.network_ext_ip, device.network_int_ip)],
+        "lifecycle": [(device_id, device.warranty_date)],
+        "udfs": [(device_id, key, value) for key, value in (device.udfs or {}).items()],
+    }
+
+# Column lists for the child rows produced by _child_rows
+API_CHILD_INSERTS = {
+    "software": "INSERT INTO software (device_id, antivirus, software_status) VALUES (?, ?, ?)",
+    "patch_management": """
         INSERT INTO patch_management (device_id, patch_status, patches_approved_pending, patches_not_approved, patches_installed)
         VALUES (?, ?, ?, ?, ?)
-    """, (
-        device_id,
-        api_data.get("patchManagement").get("patchStatus"),
-        api_data.get("patchManagement").get("patchesApprovedPending"),
-        api_data.get("patchManagement").get("patchesNotApproved"),
-        api_data.get("patchManagement").get("patchesInstalled")
-    ))
-
-    # Insert into monitoring
-    cursor.execute("""
-        INSERT INTO monitoring (device_id, network_ext_ip, network_int_ip)
-        VALUES (?, ?, ?)
-    """, (
-        device_id,
-        api_data.get("extIpAddress"),
-        api_data.get("intIpAddress"),
-    ))
-
-    # Insert into lifecycle (warranty info)
-    cursor.execute("""
-        INSERT INTO lifecycle (device_id, warranty_date)
-        VALUES (?, ?)
-    """, (
-        device_id,
-        api_data.get("warrantyDate")
-    ))
-
-    # Insert UDFs
-    for key, value in api_data.get("udf", {}).items():
-        if value and str(value).lower() != "null":
-            cursor.execute("""
-                INSERT INTO udfs (device_id, key, value)
-                VALUES (?, ?, ?)
-            """, (device_id, key, str(value)))
+    """,
+    "monitoring": "INSERT INTO monitoring (device_id, network_ext_ip, network_int_ip) VALUES (?, ?, ?)",
+    "lifecycle": "INSERT INTO lifecycle (device_id, warranty_date) VALUES (?, ?)",
+    "udfs": "INSERT INTO udfs (device_id, key, value) VALUES (?, ?, ?)",
+}
 
-    conn.commit()
-    cursor.close()
\ No newline at end of file
+# Columns the API owns but reconcile fills from the PDF when the API has
+# nothing: column -> (table, column holding the PDF value). The API value
+# always overwrites the column; when it is empty, the PDF value is used.
+API_PDF_FALLBACKS = {
+    "serial_number": ("devices", "pdf_serial_number"),
+    "antivirus": ("software", "pdf_antivirus"),
+    "warranty_date": ("lifecycle", "pdf_warranty_date"),
+}
+
+def _api_assignment(column):
+    if column in API_PDF_FALLBACKS:
+        return f"{column} = COALESCE(NULLIF(?, ''), {API_PDF_FALLBACKS[column][1]})"
+    return f"{column} = ?"
+
+# In-place updates for the one-row-per-device child tables, so an API change
+# never drops the columns reconcile adds to the same row (office_key,
+# bitlocker_status, mac_address, warranty_status).
+# Parameters are a _child_rows row with device_id moved to the end.
+API_CHILD_UPDATES = {
+    "software": f"UPDATE software SET {_api_assignment('antivirus')}, software_status = ? WHERE device_id = ?",
+    "patch_management": """
+        UPDATE patch_management SET patch_status = ?, patches_approved_pending = ?, patches_not_approved = ?, patches_installed = ?
+        WHERE device_id = ?
+    """,
+    "monitoring": "UPDATE monitoring SET network_ext_ip = ?, network_int_ip = ? WHERE device_id = ?",
+    "lifecycle": f"UPDATE lifecycle SET {_api_assignment('warranty_date')} WHERE device_id = ?",
+}
+
+# Parameters are a _device_row, then content_hash and the device id
+API_DEVICE_UPDATE = f"""
+    UPDATE devices SET {", ".join(_api_assignment(column) for column in API_DEVICE_COLUMNS)}, content_hash = ?
+    WHERE id = ?
+"""
+
+def _existing_uids(cursor, uids, chunk_size=500):
+    # Chunked to stay under SQLite's bound-parameter limit
+    existing = set()
+    for start in range(0, len(uids), chunk_size):
+        chunk = uids[start:start + chunk_size]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"SELECT uid FROM devices WHERE uid IN ({placeholders})", chunk)
+        existing.update(uid for (uid,) in cursor.fetchall())
+    return existing
+
+def insert_devices(conn, devices):
+    """
+    Bulk insert an iterable of DeviceRecords.
+
+    Device ids are assigned up front from a lookup of the batch's existing uids
+    and MAX(id), so no per-device SELECT is needed, and every table is written
+    with a single executemany. The lookup and the writes share one
+    BEGIN IMMEDIATE transaction, so concurrent writers can't reuse the ids.
+    As with the single-row path, a device whose uid already exists is not
+    re-inserted.
+    Returns the number of devices written.
+    """
+    cursor = conn.cursor()
+    try:
+        devices = list(devices)
+        with metrics.timed("sql_batch_seconds", operation="insert_devices"), write_transaction(conn):
+            existing = _existing_uids(cursor, [device.uid for device in devices])
+            next_id = (cursor.execute("SELECT MAX(id) FROM devices").fetchone()[0] or 0) + 1
+
+            device_rows = []
+            child_rows = {table: [] for table in API_CHILD_INSERTS}
+
+            for device in devices:
+                if device.uid in existing:
+                    continue
+                existing.add(device.uid)
+
+                device_id = next_id
+                next_id += 1
+                device_rows.append((device_id, *_device_row(device)))
+                for table, rows in _child_rows(device_id, device).items():
+                    child_rows[table].extend(rows)
+
+            cursor.executemany(f"""
+                INSERT INTO devices (id, {", ".join(API_DEVICE_COLUMNS)})
+                VALUES ({", ".join("?" * (len(API_DEVICE_COLUMNS) + 1))})
+            """, device_rows)
+            for table, sql in API_CHILD_INSERTS.items():
+                cursor.executemany(sql, child_rows[table])
+        metrics.inc("sql_rows_total", len(device_rows), operation="insert_devices")
+
+        return len(device_rows)
+    finally:
+        cursor.close()
+
+def insert_devices_from_api(conn, devices):
+    """
+    insert_devices for an iterable of API device dicts.
+    """
+    return insert_devices(conn, map(DeviceRecord.from_api, devices))
@@ -2,6 +2,8 @@ from core.extractors.detailed_computer_audit import DetailedComputerAuditExtract
 
 def get_extractor(filename):
     # Add the logic to match the file and return the corresponding extractor class
+    # Saved uploads have spaces replaced with underscores, so match either form
+    filename = filename.replace("_", " ")
     if "Detailed Computer Audit" in filename:
         return DetailedComputerAuditExtractor
     # elif "Device Activity" in filename:
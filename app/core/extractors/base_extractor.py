@@ -1,4 +1,7 @@
 class BaseExtractor:
+    # Bump in subclasses when parsing changes, to invalidate cached tables
+    VERSION = 1
+
     def __init__(self, tables):
         self.tables = tables
 
@@ -1,183 +1,283 @@
+from config.config import Config
+from core.models import DeviceRecord, Disk
 from .base_extractor import BaseExtractor
-import pandas as pd
+from .label_parser import LabelMatcher
+
+# "Label: value" rows and the (section, DeviceRecord field) they fill
+FIELD_LABELS = {
+    "Device Name": ("device", "name"),
+    "Description": ("device", "description"),
+    "Domain": ("device", "domain"),
+    "Last User": ("device", "last_user"),
+    "Serial Number": ("device", "serial_number"),
+    "Last Reboot": ("device", "last_reboot"),
+    "Operating System": ("device", "os_version"),
+    "OS Architecture": ("device", "architecture"),
+    "Windows Activation Key": ("device", "windows_key"),
+    "Processor": ("hardware", "processor"),
+    "Memory": ("hardware", "ram"),
+    "Motherboard": ("hardware", "motherboard"),
+    "BIOS Name": ("hardware", "bios_version"),
+    "Office Activation Key": ("software", "office_key"),
+    "BitLocker Detail": ("software", "bitlocker_status"),
+    "Antivirus Product": ("software", "antivirus"),
+    "Ext IP Address": ("monitoring", "network_ext_ip"),
+    "Int IP Address": ("monitoring", "network_int_ip"),
+    "Warranty Date": ("lifecycle", "warranty_date"),
+    "Warranty Status": ("lifecycle", "warranty_status"),
+}
+
+# Rows that need more than a copied value
+DISPLAY_ADAPTERS = "display_adapters"
+MAC_ADDRESS = "mac_address"
+
+ROW_MATCHER = LabelMatcher(
+    {**FIELD_LABELS, "Display Adapter": DISPLAY_ADAPTERS, "MAC Address": MAC_ADDRESS},
+    prefixes={"Realtek": MAC_ADDRESS},
+)
+
+# ROW_MATCHER's lookups for the vectorized parser, mapping straight to a name
+# (the field, MAC_ADDRESS or DISPLAY_ADAPTERS) so whole columns go through dict maps
+LABEL_NAMES = {label: target[1] if isinstance(target, tuple) else target for label, target in ROW_MATCHER.labels.items()}
+PREFIX_NAMES = {word: target[1] if isinstance(target, tuple) else target for word, target in ROW_MATCHER.prefixes.items()}
+FIELD_NAMES = frozenset(field for _, field in FIELD_LABELS.values())
+
+# Columns of a "Local Fixed Disk" row, in table order
+STORAGE_COLUMNS = ("drive_letter", "disk_description", "disk_size", "disk_used", "disk_usage_percent")
+
+# Headers that end the display adapter list
+SECTION_HEADERS = frozenset(["Disk Drive", "Device Status", "User-Defined-Fields", "Device Information", "Hardware", "Networking"])
 
 class DetailedComputerAuditExtractor(BaseExtractor):
-    def __init__(self, filepath, tables):
+    VERSION = 2
+
+    def __init__(self, filepath, tables, debug=False, vectorized=True, batch_size=None):
         super().__init__(filepath)
         self.tables = tables  # <--- store tables as instance attribute
+        self.debug = debug  # dump every parsed row to stdout
+        self.vectorized = vectorized  # parse with whole-column pandas operations
+        # Device groups the vectorized path parses at once (Config.PDF_PARSE_BATCH_SIZE)
+        self.batch_size = batch_size or Config.PDF_PARSE_BATCH_SIZE
+
+    @staticmethod
+    def clean_dataframe(df):
+        # Column-wise string ops rather than a Python call per cell
+        return df.apply(lambda column: column.astype(str).str.replace("\n", "", regex=False).str.strip())
+
+    def iter_table_groups(self, clean=True):
+        """
+        Yield each device's tables as soon as the next "Device Information"
+        table closes its group. Tables are consumed one at a time, so only
+        the current device's tables are held in memory. With clean=False the
+        tables are passed through raw, for callers that clean a whole batch.
+        Tables before the first "Device Information" (the cover page) belong
+        to no device and are skipped.
+        """
+        group = None
+        for table in self.tables:
+            df = table.df
+            if df.empty:
+                continue
+            first_cell = str(df.iat[0, 0]).replace("\n", "").strip().lower()
+            if "device information" in first_cell:
+                if group:
+                    yield group
+                group = []
+            if group is not None:
+                group.append(self.clean_dataframe(df) if clean else df)
+
+        if group:
+            yield group
+
+    def iter_groups(self):
+        """
+        Yield each device's rows as lists of cell strings.
+        """
+        for frames in self.iter_table_groups():
+            yield self._group_rows(frames)
+
+    @staticmethod
+    def _group_rows(frames):
+        # Tables in a group differ in width; pad every row to the widest one
+        rows = [row for df in frames for row in df.values.tolist()]
+        width = max(len(row) for row in rows)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def iter_devices(self):
+        """
+        Stream parsed devices, one per "Device Information" group.
+        """
+        if self.vectorized:
+            for batch in self._iter_batches():
+                yield from self._parse_batch(batch)
+        else:
+            for rows in self.iter_groups():
+                yield self._parse_group(rows)
 
     def parse(self):
-        devices = []
-        def get_value(row, key):
-            for item in row:
-                if item.strip().startswith(key):
-                    return item.split(":", 1)[-1].strip()
-            return ""
-
-        def clean_dataframe(df):
-            return df.astype(str).replace(r'\n', '', regex=True).map(str.strip)
-
-        def split_by_device(tables):
-            table_dfs = [clean_dataframe(table.df) for table in tables]
-            groups = []
-            current_group = []
-
-            for df in table_dfs:
-                first_cell = df.iloc[0, 0].strip().lower()
-                if "device information" in first_cell:
-                    if current_group:
-                        groups.append(current_group)
-                        current_group = []
-                current_group.append(df)
-
-            if current_group:
-                groups.append(current_group)
-
-            return [pd.concat(group, ignore_index=True) for group in groups]
-        
-        grouped_tables = split_by_device(self.tables)
-    
-
-        for group in grouped_tables:
-            # Device dictionary with a 'device' key
-            device = {
-                "device": {
-                    "device_name": "",
-                    "description": "",
-                    "domain": "",
-                    "last_user": "",
-                    "serial_number": "",
-                    "os_version": "",
-                    "architecture": "",
-                    "last_reboot": "",
-                },
-                "hardware": {
-                    "cpu": "",
-                    "ram": "",
-                    "motherboard": "",
-                    "bios_version": "",
-                    "display_adapter": ""
-                },
-                "software": {
-                    "office_key": "",
-                    "antivirus": "",
-                    "bitlocker_status": ""
-                },
-                "monitoring": {
-                    "network_ext_ip": "",
-                    "network_int_ip": "",
-                    "mac_address": ""
-                },
-                "security_events": {
-                    "firewall_enabled": "",
-                    "defender_active": "",
-                    "last_scan": ""
-                },
-                "backups": {
-                    "backup_status": "",
-                    "last_backup": ""
-                },
-                "device_health": {
-                    "status": "",
-                    "issues": ""
-                },
-                "patch_management": {
-                    "pending_updates": "",
-                    "last_patch_date": ""
-                },
-                "lifecycle": {
-                    "purchase_date": "",
-                    "warranty_date": "",
-                    "warranty_status": ""
-                },
-                "storage": []  # To store multiple storage devices
-            }
-
-            rows = group.astype(str).map(str.strip).values.tolist()
+        return list(self.iter_devices())
+
+    def _iter_batches(self):
+        batch = []
+        for frames in self.iter_table_groups(clean=False):
+            batch.append(frames)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def device_frame(self, groups):
+        """
+        Pivot a batch of device groups (lists of raw tables) into a frame
+        with one row per device and one column per FIELD_LABELS field, plus
+        "mac_address" and "display_adapter". Fields a device does not have are
+        NaN. Also returns its storage rows, with a "device" column holding the
+        row number in the batch. All matching is done on whole columns.
+        """
+        import numpy as np
+        import pandas as pd
+
+        frames = [df.set_axis(range(df.shape[1]), axis=1) for group in groups for df in group]
+        device = np.repeat(np.arange(len(groups)), [sum(len(df) for df in group) for group in groups])
+        # The batch is cleaned here in one pass, not table by table
+        width = max(5, max(df.shape[1] for df in frames))
+        cells = self.clean_dataframe(pd.concat(frames, ignore_index=True).reindex(columns=range(width)).fillna(""))
+        devices = range(len(groups))
+
+        if self.debug:
+            for idx, row in enumerate(cells.values.tolist()):
+                print(f"{device[idx]:03d}/{idx:05d}: " + " | ".join(row))
+
+        first = cells[0]
+        parts = first.str.partition(":")
+        label = parts[0].str.strip()
+        value = parts[2].str.strip()
+
+        # The label before the colon, else the first word, looked up for every row at once
+        target_name = label.map(LABEL_NAMES)
+        if PREFIX_NAMES:
+            first_word = first.str.split(n=1).str[0]
+            target_name = target_name.where(target_name.notna(), first_word.map(PREFIX_NAMES))
+
+        # Plain fields (field names are unique across sections): the last occurrence in a group wins
+        is_field = target_name.isin(FIELD_NAMES).to_numpy(dtype=bool)
+        wide = (
+            pd.DataFrame({"device": device[is_field], "field": target_name[is_field], "value": value[is_field]})
+            .drop_duplicates(["device", "field"], keep="last")
+            .pivot(index="device", columns="field", values="value")
+            .reindex(index=devices, columns=[field for _, field in FIELD_LABELS.values()])
+        )
+
+        # MAC address: the value after the colon, else the row's last filled cell
+        is_mac = (target_name == MAC_ADDRESS).to_numpy(dtype=bool)
+        trailing = cells.loc[is_mac, 1:]
+        last_filled = trailing.where(trailing != "").ffill(axis=1).iloc[:, -1].fillna("")
+        mac = value[is_mac].where(value[is_mac] != "", last_filled)
+        wide["mac_address"] = mac.groupby(device[is_mac]).last().reindex(devices)
+
+        # Display adapters: cells in each group's last "Display Adapter" section
+        is_display = (target_name == DISPLAY_ADAPTERS).to_numpy(dtype=bool)
+        section = (first.isin(SECTION_HEADERS).to_numpy() | is_display).cumsum()
+        last_display = pd.Series(section[is_display]).groupby(device[is_display]).last()
+        has_display = pd.Series(device).map(last_display)
+        in_display = (has_display.to_numpy() == section) & ~is_display
+        adapters = pd.Series("", index=devices, dtype=object)
+        if in_display.any():
+            stacked = cells[in_display].stack()
+            stacked = stacked[(stacked != "") & ~stacked.str.contains("Description|Size|Used")]
+            pieces = stacked.str.split("|").explode().str.strip()
+            pieces = pieces[pieces != ""]
+            owners = device[pieces.index.get_level_values(0)]
+            joined = (
+                pd.DataFrame({"device": owners, "adapter": pieces.to_numpy()})
+                .drop_duplicates()
+                .groupby("device", sort=True)["adapter"]
+                .agg(" | ".join)
+            )
+            adapters.update(joined)
+        wide["display_adapter"] = adapters.where(last_display.reindex(devices).notna().to_numpy())
+
+        # Storage: unlabelled rows containing a "Local Fixed Disk" cell
+        is_storage = target_name.isna().to_numpy() & cells.eq("Local Fixed Disk").any(axis=1).to_numpy()
+        storage = cells.loc[is_storage, [0, 1, 2, 3, 4]].set_axis(list(STORAGE_COLUMNS), axis=1)
+        storage.insert(0, "device", device[is_storage])
+
+        return wide, storage
+
+    def _parse_batch(self, groups):
+        wide, storage = self.device_frame(groups)
+
+        storage_by_device = {}
+        for device, *disk in storage.itertuples(index=False, name=None):
+            storage_by_device.setdefault(device, []).append(Disk(*disk))
+
+        for index, record in enumerate(wide.to_dict("records")):
+            # Missing fields are NaN in the frame
+            fields = {field: value for field, value in record.items() if isinstance(value, str)}
+            yield DeviceRecord(**fields, storage=storage_by_device.get(index, []))
+
+    @staticmethod
+    def _display_adapters(rows, start):
+        """
+        Collect adapter names from the rows after a "Display Adapter" header,
+        up to the next section header.
+        """
+        adapters = []
+        for current in rows[start:]:
+            # Stop at a known section header
+            if current[0] in SECTION_HEADERS:
+                break
+
+            # Check all columns in case multiple adapters are packed into one row
+            for cell in current:
+                if cell and not any(x in cell for x in ["Description", "Size", "Used", "Used %"]):
+                    # Split on pipes if multiple adapters in one cell
+                    for adapter in cell.split("|"):
+                        adapter = adapter.strip()
+                        if adapter and adapter not in adapters:
+                            adapters.append(adapter)
+        return " | ".join(adapters)
+
+    @staticmethod
+    def _mac_address(row, value):
+        # Either "MAC Address: xx" or the address in the row's last filled cell
+        if value:
+            return value
+        for cell in reversed(row[1:]):
+            if cell:
+                return cell
+        return ""
+
+    def _parse_group(self, rows):
+        fields = {}
+        storage = []
+
+        if self.debug:
             for idx, row in enumerate(rows):
                 print(f"{idx:03d}: " + " | ".join(str(cell) for cell in row))
-            rows_with_next = zip(rows, rows[1:] + [[""] * len(rows[0])])  # Handles end-of-list safely
-
-            for row, next_row in rows_with_next:
-                if "Device Name:" in row[0]:
-                    device["device"]["device_name"] = get_value(row, "Device Name")
-                elif "Description:" in row[0]:
-                    device["device"]["description"] = get_value(row, "Description")
-                elif "Domain:" in row[0]:
-                    device["device"]["domain"] = get_value(row, "Domain")
-                elif "Last User:" in row[0]:
-                    device["device"]["last_user"] = get_value(row, "Last User")
-                elif "Serial Number:" in row[0]:
-                    device["device"]["serial_number"] = get_value(row, "Serial Number")
-                elif "Last Reboot:" in row[0]:
-                    device["device"]["last_reboot"] = get_value(row, "Last Reboot")
-                elif "Operating System:" in row[0]:
-                    device["device"]["os_version"] = get_value(row, "Operating System")
-                elif "OS Architecture:" in row[0]:
-                    device["device"]["architecture"] = get_value(row, "OS Architecture")
-                elif "Windows Activation Key:" in row[0]:
-                    device["device"]["windows_key"] = get_value(row, "Windows Activation Key")
-
-                elif "Processor:" in row[0]:
-                    device["hardware"]["cpu"] = get_value(row, "Processor")
-                elif "Memory:" in row[0]:
-                    device["hardware"]["ram"] = get_value(row, "Memory")
-                elif "Motherboard:" in row[0]:
-                    device["hardware"]["motherboard"] = get_value(row, "Motherboard")
-                elif "BIOS Name:" in row[0]:
-                    device["hardware"]["bios_version"] = get_value(row, "BIOS Name")
-                elif "Display Adapter" in row[0]:
-                    adapters = []
-                    i = rows.index(row) + 1
-
-                    while i < len(rows):
-                        current = rows[i]
-
-                        # Stop at a known section header
-                        first_cell = current[0].strip() if current else ""
-                        if first_cell in ["Disk Drive", "Device Status", "User-Defined-Fields", "Device Information", "Hardware", "Networking"]:
-                            break
-
-                        # Check all columns in case multiple adapters are packed into one row
-                        for cell in current:
-                            if cell and isinstance(cell, str):
-                                cell = cell.strip()
-                                if cell and not any(x in cell for x in ["Description", "Size", "Used", "Used %"]):
-                                    # Split on pipes if multiple adapters in one cell
-                                    for adapter in cell.split("|"):
-                                        adapter = adapter.strip()
-                                        if adapter and adapter not in adapters:
-                                            adapters.append(adapter)
-                        i += 1
-                    device["hardware"]["display_adapter"] = " | ".join(adapters)
-                elif "Office Activation Key:" in row[0]:
-                    device["software"]["office_key"] = get_value(row, "Office Activation Key")
-                elif "BitLocker Detail:" in row[0]:
-                    device["software"]["bitlocker_status"] = get_value(row, "BitLocker Detail")
-                elif "Antivirus Product:" in row[0]:
-                    device["software"]["antivirus"] = get_value(row, "Antivirus Product")
-
-                elif "Ext IP Address:" in row[0]:
-                    device["monitoring"]["network_ext_ip"] = get_value(row, "Ext IP Address")
-                elif "Int IP Address:" in row[0]:
-                    device["monitoring"]["network_int_ip"] = get_value(row, "Int IP Address")
-                elif "Realtek" in row[0] or "MAC Address" in row[0]:
-                    device["monitoring"]["mac_address"] = row[-1].strip()
-                elif "Warranty Date:" in row[0]:
-                    device["lifecycle"]["warranty_date"] = get_value(row, "Warranty Date")
-                elif "Warranty Status:" in row[0]:
-                    device["lifecycle"]["warranty_status"] = get_value(row, "Warranty Status")
-
-                elif "Local Fixed Disk" in row:
-                    storage_device = {
-                        "drive_letter": row[0] if len(row) > 1 else "",
-                        "disk_description": row[1] if len(row) > 1 else "",
-                        "disk_size": row[2] if len(row) > 2 else "",
-                        "disk_used": row[3] if len(row) > 3 else "",
-                        "disk_usage_percent": row[4] if len(row) > 4 else ""
-                    }
-                    device["storage"].append(storage_device)
-
-            devices.append(device)
-
-        return devices
+
+        for idx, row in enumerate(rows):
+            match = ROW_MATCHER.match(row[0])
+
+            if match is None:
+                if "Local Fixed Disk" in row:
+                    storage.append(Disk(
+                        drive_letter=row[0] if len(row) > 1 else "",
+                        disk_description=row[1] if len(row) > 1 else "",
+                        disk_size=row[2] if len(row) > 2 else "",
+                        disk_used=row[3] if len(row) > 3 else "",
+                        disk_usage_percent=row[4] if len(row) > 4 else "",
+                    ))
+                continue
+
+            target, value = match
+            if target == DISPLAY_ADAPTERS:
+                fields["display_adapter"] = self._display_adapters(rows, idx + 1)
+            elif target == MAC_ADDRESS:
+                fields["mac_address"] = self._mac_address(row, value)
+            else:
+                _, field = target
+                fields[field] = value
+
+        return DeviceRecord(**fields, storage=storage)
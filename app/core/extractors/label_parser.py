@@ -0,0 +1,34 @@
+class LabelMatcher:
+    """
+    Matches a table row's first cell to a target in one dictionary lookup.
+
+    labels:   exact label -> target, where the label is the cell text before
+              its first colon ("Device Name: X" -> "Device Name"), or the
+              whole cell for headers without a colon ("Display Adapter").
+    prefixes: first word -> target, for rows identified by a leading word
+              rather than a label (e.g. "Realtek PCIe GbE ...").
+
+    The cost per row is constant, however many labels are defined.
+    """
+    def __init__(self, labels, prefixes=None):
+        self.labels = dict(labels)
+        self.prefixes = dict(prefixes or {})
+
+    def match(self, cell):
+        """
+        Return (target, value) for a cell, value being the stripped text after
+        the colon (empty if there is none), or None if nothing matches.
+        """
+        label, _, value = cell.partition(":")
+        target = self.labels.get(label.strip())
+        if target is not None:
+            return target, value.strip()
+
+        if self.prefixes:
+            words = cell.split(None, 1)
+            if words:
+                target = self.prefixes.get(words[0])
+                if target is not None:
+                    return target, value.strip()
+
+        return None
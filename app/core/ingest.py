@@ -0,0 +1,74 @@
+import contextvars
+import queue
+import threading
+
+from config.config import Config
+from core.database import insert_devices_from_api, tune_for_bulk_load
+
+_DONE = object()
+
+def prefetch(iterable, depth=1):
+    """
+    Iterate `iterable` in a background thread, staying up to `depth` items
+    ahead of the consumer. Used to fetch the next API page while the current
+    one is being written to SQLite. Exceptions are re-raised in the caller.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(e)
+            return
+        buffer.put(_DONE)
+
+    # The producer runs in this context so its HTTP timings count towards the tracked run
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(producer,), daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer if the consumer stops early
+        stop.set()
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
+
+def ingest_device_pages(conn, pages, batch_size=None):
+    """
+    Write devices from an iterable of API pages into SQLite in batches.
+    Pages are fetched one ahead in a background thread, so the network and
+    the database overlap and at most two pages are in memory at once.
+    Returns a summary of what was ingested.
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    tune_for_bulk_load(conn)
+    summary = {"pages": 0, "devices": 0}
+    batch = []
+
+    for page in prefetch(pages):
+        summary["pages"] += 1
+        for device in page:
+            batch.append(device)
+            if len(batch) >= batch_size:
+                summary["devices"] += insert_devices_from_api(conn, batch)
+                batch = []
+
+    if batch:
+        summary["devices"] += insert_devices_from_api(conn, batch)
+
+    return summary
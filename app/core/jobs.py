@@ -0,0 +1,137 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class Job:
+    """
+    A unit of background work with per-stage progress.
+    Stages are declared up front so clients can render them before they start.
+    """
+    def __init__(self, key, stages):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.stages = OrderedDict((name, {"status": QUEUED, "done": 0, "total": None}) for name in stages)
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def start(self):
+        with self._lock:
+            self.status = RUNNING
+            self.started = time.time()
+
+    def succeed(self, result):
+        with self._lock:
+            self.result = result
+            self.status = DONE
+            self.finished = time.time()
+
+    def fail(self, error):
+        with self._lock:
+            self.error = str(error)
+            self.status = FAILED
+            for stage in self.stages.values():
+                if stage["status"] == RUNNING:
+                    stage["status"] = FAILED
+            self.finished = time.time()
+
+    def start_stage(self, stage, total=None):
+        with self._lock:
+            self.stages[stage].update(status=RUNNING, total=total)
+
+    def progress(self, stage, done, total=None):
+        with self._lock:
+            self.stages[stage]["done"] = done
+            if total is not None:
+                self.stages[stage]["total"] = total
+
+    def finish_stage(self, stage):
+        with self._lock:
+            self.stages[stage]["status"] = DONE
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "key": self.key,
+                "status": self.status,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }
+
+class JobManager:
+    """
+    Runs jobs on a local thread pool.
+
+    Submitting work for a key (e.g. a site) that already has a queued or
+    running job returns that job instead of starting another. The most recent
+    `history` jobs are kept so their status and results stay queryable.
+    """
+    def __init__(self, max_workers=4, history=100):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._history = history
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, stages, fn, *args, **kwargs):
+        """
+        Queue fn(job, *args, **kwargs) and return (job, created).
+        created is False when an active job for the same key was returned.
+        """
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None and existing.active:
+                return existing, False
+
+            job = Job(key, stages)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._trim()
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(len(self._jobs) - self._history, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, fn, args, kwargs):
+        job.start()
+        try:
+            job.succeed(fn(job, *args, **kwargs))
+        except Exception as e:
+            traceback.print_exc()
+            job.fail(e)
+        finally:
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
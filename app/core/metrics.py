@@ -0,0 +1,168 @@
+"""
+Lightweight timers and counters.
+
+Everything recorded goes to the process-wide `registry`, served by the
+/metrics endpoint in Prometheus text format, and to the run being tracked
+in the current context (see track_run), which prints one JSON line with its
+own totals when it ends. Recording is a lock and a few additions, cheap
+enough to wrap every HTTP call and SQL batch.
+"""
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "reportgen"
+
+HELP = {
+    "stage_seconds": "Time spent in each site run stage.",
+    "http_request_seconds": "Outbound Datto API requests, by endpoint.",
+    "http_responses_total": "Datto API responses, by endpoint and status code.",
+    "http_retries_total": "Datto API requests retried after an error or retryable status.",
+    "sql_batch_seconds": "SQLite write batches, by operation.",
+    "sql_rows_total": "Rows (devices) handled by SQLite write batches, by operation.",
+    "pdf_extract_seconds": "Table extraction per PDF, including cache lookups.",
+    "pdf_parse_seconds": "Time spent parsing extracted tables into devices.",
+    "snapshot_seconds": "Writing monthly snapshots and reading trends from them.",
+    "runs_total": "Tracked runs, by kind and outcome.",
+    "run_seconds": "Wall time of tracked runs, by kind.",
+}
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+class Metrics:
+    """
+    Thread-safe counters and timers keyed by name plus labels.
+    Timers keep count, sum and max of their observations.
+    """
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            count, total, peak = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds, max(peak, seconds))
+
+    def summary(self):
+        """
+        Plain dict of everything recorded, keyed like 'name{label=value}'.
+        """
+        def label(name, labels):
+            return f"{name}{{{','.join(f'{k}={v}' for k, v in labels)}}}" if labels else name
+
+        with self._lock:
+            return {
+                "timers": {
+                    label(name, labels): {"count": count, "seconds": round(total, 6), "max": round(peak, 6)}
+                    for (name, labels), (count, total, peak) in sorted(self.timers.items())
+                },
+                "counters": {label(name, labels): value for (name, labels), value in sorted(self.counters.items())},
+            }
+
+    def render(self):
+        """
+        Prometheus text exposition: counters as counters, timers as summaries.
+        """
+        def labels_text(labels):
+            if not labels:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            timers = sorted(self.timers.items())
+
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}"
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {metric} {HELP.get(name, name)}", f"# TYPE {metric} counter"]
+            lines.append(f"{metric}{labels_text(labels)} {value}")
+        for (name, labels), (count, total, _) in timers:
+            metric = f"{PREFIX}_{name}"
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {metric} {HELP.get(name, name)}", f"# TYPE {metric} summary"]
+            lines.append(f"{metric}_count{labels_text(labels)} {count}")
+            lines.append(f"{metric}_sum{labels_text(labels)} {total:.6f}")
+        return "\n".join(lines) + "\n"
+
+registry = Metrics()
+
+# The run being tracked in this context, if any
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+    run = _current_run.get()
+    if run is not None:
+        run.inc(name, amount, **labels)
+
+def observe(name, seconds, **labels):
+    registry.observe(name, seconds, **labels)
+    run = _current_run.get()
+    if run is not None:
+        run.observe(name, seconds, **labels)
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def timed_iter(iterable, name, **labels):
+    """
+    Yield from `iterable`, recording only the time spent producing items
+    (not the consumer's time between them) as one observation.
+    """
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        observe(name, elapsed, **labels)
+
+@contextmanager
+def track_run(kind, **fields):
+    """
+    Collect the metrics recorded in this context (and in threads started
+    with its context copied) into a per-run Metrics, and print them as one
+    JSON line when the run ends.
+    """
+    run = Metrics()
+    token = _current_run.set(run)
+    start = time.perf_counter()
+    outcome = "failed"
+    try:
+        yield run
+        outcome = "done"
+    finally:
+        _current_run.reset(token)
+        seconds = time.perf_counter() - start
+        registry.inc("runs_total", kind=kind, outcome=outcome)
+        registry.observe("run_seconds", seconds, kind=kind)
+        line = {"event": "run_metrics", "kind": kind, **fields, "outcome": outcome, "seconds": round(seconds, 6), **run.summary()}
+        print(json.dumps(line, default=str), flush=True)
@@ -0,0 +1,151 @@
+"""
+Typed device records shared by the Datto API and PDF paths.
+
+Both sources produce DeviceRecord objects and the database writers read
+their attributes directly, so there is one set of field names from parsing
+to SQL. Records are flat and slotted: a field the source doesn't have is
+None, not an empty-string placeholder in a nested dict, and a device costs
+one small object instead of ten dicts.
+"""
+from typing import NamedTuple, Optional
+
+class Disk(NamedTuple):
+    """
+    A "Local Fixed Disk" row, in storage table column order.
+    """
+    drive_letter: Optional[str] = None
+    disk_description: Optional[str] = None
+    disk_size: Optional[str] = None
+    disk_used: Optional[str] = None
+    disk_usage_percent: Optional[str] = None
+
+# Every DeviceRecord field, grouped by the table it is stored in
+DEVICE_FIELDS = (
+    # devices
+    "uid", "name", "description", "last_user", "domain", "os_version", "serial_number",
+    "architecture", "windows_key", "last_reboot",
+    # hardware
+    "processor", "ram", "motherboard", "bios_version", "display_adapter",
+    # software
+    "office_key", "antivirus", "bitlocker_status", "software_status",
+    # monitoring
+    "network_ext_ip", "network_int_ip", "mac_address",
+    # security_events
+    "firewall_enabled", "defender_active", "last_scan",
+    # patch_management
+    "patch_status", "patches_approved_pending", "patches_not_approved", "patches_installed",
+    # lifecycle
+    "warranty_date", "warranty_status",
+    # udfs ({key: value}) and storage (list of Disk)
+    "udfs", "storage",
+)
+
+class DeviceRecord:
+    """
+    One device from either source. Construct with keyword arguments; every
+    field defaults to None except storage (an empty tuple).
+    """
+    __slots__ = DEVICE_FIELDS
+
+    def __init__(
+        self, *, uid=None, name=None, description=None, last_user=None, domain=None, os_version=None,
+        serial_number=None, architecture=None, windows_key=None, last_reboot=None,
+        processor=None, ram=None, motherboard=None, bios_version=None, display_adapter=None,
+        office_key=None, antivirus=None, bitlocker_status=None, software_status=None,
+        network_ext_ip=None, network_int_ip=None, mac_address=None,
+        firewall_enabled=None, defender_active=None, last_scan=None,
+        patch_status=None, patches_approved_pending=None, patches_not_approved=None, patches_installed=None,
+        warranty_date=None, warranty_status=None, udfs=None, storage=(),
+    ):
+        self.uid = uid
+        self.name = name
+        self.description = description
+        self.last_user = last_user
+        self.domain = domain
+        self.os_version = os_version
+        self.serial_number = serial_number
+        self.architecture = architecture
+        self.windows_key = windows_key
+        self.last_reboot = last_reboot
+        self.processor = processor
+        self.ram = ram
+        self.motherboard = motherboard
+        self.bios_version = bios_version
+        self.display_adapter = display_adapter
+        self.office_key = office_key
+        self.antivirus = antivirus
+        self.bitlocker_status = bitlocker_status
+        self.software_status = software_status
+        self.network_ext_ip = network_ext_ip
+        self.network_int_ip = network_int_ip
+        self.mac_address = mac_address
+        self.firewall_enabled = firewall_enabled
+        self.defender_active = defender_active
+        self.last_scan = last_scan
+        self.patch_status = patch_status
+        self.patches_approved_pending = patches_approved_pending
+        self.patches_not_approved = patches_not_approved
+        self.patches_installed = patches_installed
+        self.warranty_date = warranty_date
+        self.warranty_status = warranty_status
+        self.udfs = udfs
+        self.storage = storage
+
+    @classmethod
+    def from_api(cls, api_data):
+        """
+        Record for a device dict from the Datto API. Nested sections the API
+        leaves out (antivirus, patchManagement, udf) read as empty.
+        """
+        antivirus = api_data.get("antivirus") or {}
+        patch = api_data.get("patchManagement") or {}
+        udfs = {
+            key: str(value)
+            for key, value in (api_data.get("udf") or {}).items()
+            if value and str(value).lower() != "null"
+        }
+        return cls(
+            uid=api_data.get("uid"),
+            name=api_data.get("hostname"),
+            description=api_data.get("description"),
+            last_user=api_data.get("lastLoggedInUser"),
+            domain=api_data.get("domain"),
+            os_version=api_data.get("operatingSystem"),
+            serial_number=api_data.get("serialNumber"),
+            antivirus=antivirus.get("antivirusProduct"),
+            software_status=api_data.get("softwareStatus"),
+            network_ext_ip=api_data.get("extIpAddress"),
+            network_int_ip=api_data.get("intIpAddress"),
+            patch_status=patch.get("patchStatus"),
+            patches_approved_pending=patch.get("patchesApprovedPending"),
+            patches_not_approved=patch.get("patchesNotApproved"),
+            patches_installed=patch.get("patchesInstalled"),
+            warranty_date=api_data.get("warrantyDate"),
+            udfs=udfs or None,
+        )
+
+    def values(self):
+        """
+        Every field as a tuple, in DEVICE_FIELDS order; storage as plain
+        tuples and udfs as sorted (key, value) pairs, for hashing.
+        """
+        return (
+            *(getattr(self, field) for field in DEVICE_FIELDS[:-2]),
+            sorted((self.udfs or {}).items()),
+            [tuple(disk) for disk in self.storage],
+        )
+
+    def as_dict(self):
+        return {
+            **{field: getattr(self, field) for field in DEVICE_FIELDS[:-1]},
+            "storage": [disk._asdict() for disk in self.storage],
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, DeviceRecord):
+            return NotImplemented
+        return self.values() == other.values()
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in DEVICE_FIELDS if getattr(self, field))
+        return f"DeviceRecord({fields})"
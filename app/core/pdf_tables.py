@@ -0,0 +1,255 @@
+import mmap
+import multiprocessing
+import os
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from config.config import Config
+from core.table_cache import TableCache, file_sha256
+
+# Bump when extraction output changes, to invalidate cached tables
+EXTRACTION_VERSION = 1
+
+# Page routing: a page goes to camelot only if it has a ruled grid at least
+# TABLE_MIN_COLUMNS wide; other pages are read from pdfplumber's text layer
+TABLE_MIN_COLUMNS = 3
+# Text layout, in points: words further apart than CELL_GAP on a line are
+# separate cells, and lines further apart than BLOCK_GAP line heights start
+# a new table
+CELL_GAP = 12
+BLOCK_GAP = 2
+LINE_TOLERANCE = 2
+
+class ExtractedTable:
+    """
+    A table pulled out of a PDF: its cells as a DataFrame and the page it was on.
+    Exposes `.df` like camelot's Table, so extractors accept either, but is
+    small and picklable enough to return from worker processes.
+    """
+    __slots__ = ("df", "page")
+
+    def __init__(self, df, page):
+        self.df = df
+        self.page = page
+
+    def __reduce__(self):
+        # Pickle as plain rows of cell strings: about half the size of a pickled
+        # DataFrame and faster to load, for both worker results and the table cache
+        return (_rebuild_table, (self.page, self.df.values.tolist()))
+
+def _rebuild_table(page, rows):
+    import pandas as pd
+
+    return ExtractedTable(pd.DataFrame(rows), page)
+
+@contextmanager
+def open_pdf(pdf_path):
+    """
+    A PDF memory-mapped read-only, for readers that take a file object
+    (PyPDF2, pdfplumber). Pages are read from the OS page cache as they are
+    used instead of the whole file being read into memory first.
+    """
+    with open(pdf_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield data
+
+def page_count(pdf_path):
+    from PyPDF2 import PdfReader
+
+    with open_pdf(pdf_path) as data:
+        return len(PdfReader(data).pages)
+
+def page_ranges(total_pages, chunk_size, first_page=1):
+    """
+    Split pages first_page..total_pages into camelot page strings like "1-10".
+    """
+    ranges = []
+    for start in range(first_page, total_pages + 1, chunk_size):
+        end = min(start + chunk_size - 1, total_pages)
+        ranges.append(f"{start}-{end}" if end > start else str(start))
+    return ranges
+
+def process_context():
+    """
+    Start method for worker pools. Jobs run on threads next to Flask's and
+    the background refresh threads, and a fork copies whatever locks those
+    hold at that moment; a forkserver (spawn where there is none) starts
+    workers from a clean single-threaded process instead.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def page_numbers(pages):
+    """
+    Expand a camelot page string like "1-3,7" to [1, 2, 3, 7].
+    """
+    numbers = []
+    for part in pages.split(","):
+        start, _, end = part.partition("-")
+        numbers.extend(range(int(start), int(end or start) + 1))
+    return numbers
+
+def extract_page_range(pdf_path, pages, flavor="lattice"):
+    """
+    Run camelot over one page range. Tables come back in page order.
+    """
+    import camelot
+
+    tables = camelot.read_pdf(pdf_path, pages=pages, flavor=flavor)
+    return [ExtractedTable(table.df, int(table.page)) for table in tables]
+
+def is_tabular(page, min_columns=TABLE_MIN_COLUMNS):
+    """
+    Whether a pdfplumber page has a ruled table at least min_columns wide,
+    i.e. min_columns + 1 vertical rulings spanning the same rows. Only the
+    page's drawn lines are looked at, not its text.
+    """
+    rulings = defaultdict(set)
+    for edge in page.vertical_edges:
+        rulings[round(edge["top"]), round(edge["bottom"])].add(round(edge["x0"]))
+    return any(len(xs) > min_columns for xs in rulings.values())
+
+def _cells(words):
+    # (x0, text) per cell of one line: words closer than CELL_GAP are joined
+    cells = []
+    right = None
+    for word in words:
+        if right is not None and word["x0"] - right <= CELL_GAP:
+            x0, text = cells[-1]
+            cells[-1] = (x0, f"{text} {word['text']}")
+        else:
+            cells.append((word["x0"], word["text"]))
+        right = word["x1"]
+    return cells
+
+def _table_rows(lines):
+    # Cells to columns: each distinct cell start (within CELL_GAP) is a column
+    columns = []
+    for x0 in sorted(x0 for cells in lines for x0, _ in cells):
+        if not columns or x0 - columns[-1] > CELL_GAP:
+            columns.append(x0)
+    rows = []
+    for cells in lines:
+        row = [""] * len(columns)
+        for x0, text in cells:
+            column = bisect_right(columns, x0) - 1
+            row[column] = f"{row[column]} {text}".strip()
+        rows.append(row)
+    return rows
+
+def text_tables(page):
+    """
+    A pdfplumber page's text layer as ExtractedTables, one per block of
+    lines, in the shape camelot gives ruled tables: a row per line and a
+    column per aligned run of words, so "Label: value" pages parse the same
+    way either side of the router.
+    """
+    import pandas as pd
+
+    blocks = []
+    lines = []
+    top = bottom = None
+    for word in page.extract_words():
+        if top is not None and abs(word["top"] - top) <= LINE_TOLERANCE:
+            lines[-1].append(word)
+            continue
+        height = word["bottom"] - word["top"]
+        if lines and word["top"] - bottom > BLOCK_GAP * height:
+            blocks.append(lines)
+            lines = []
+        lines.append([word])
+        top, bottom = word["top"], word["bottom"]
+    if lines:
+        blocks.append(lines)
+
+    return [
+        ExtractedTable(pd.DataFrame(_table_rows([_cells(words) for words in block])), page.page_number)
+        for block in blocks
+    ]
+
+def extract_routed_range(pdf_path, pages, flavor="lattice"):
+    """
+    Extract one page range, sending only the pages is_tabular() picks to
+    camelot. The rest are read from pdfplumber's text layer with
+    text_tables(), skipping camelot's image-based table detection. Pages are
+    read one at a time and released as they go. Tables come back in page order.
+    """
+    import pdfplumber
+
+    tables = []
+    tabular = []
+    with open_pdf(pdf_path) as data, pdfplumber.open(data, pages=page_numbers(pages)) as pdf:
+        for page in pdf.pages:
+            if is_tabular(page):
+                tabular.append(page.page_number)
+            else:
+                tables.extend(text_tables(page))
+            page.close()
+
+    if tabular:
+        tables.extend(extract_page_range(pdf_path, ",".join(map(str, tabular)), flavor))
+    # Stable, so tables keep their order within a page
+    return sorted(tables, key=lambda table: table.page)
+
+def iter_tables(pdf_path, workers=None, chunk_size=None, flavor="lattice", route=None):
+    """
+    Yield every table in a PDF in page order, sharding page ranges across a
+    process pool.
+
+    Camelot is single threaded, so each worker process takes a range of
+    chunk_size pages; chunks are yielded as soon as they (and every chunk
+    before them) are done, which keeps the "Device Information" grouping in
+    the extractors intact and lets them start before the whole PDF is read.
+    workers defaults to Config.PDF_EXTRACT_WORKERS; 1 runs in-process.
+    With route (default Config.PDF_PAGE_ROUTER) each chunk goes through
+    extract_routed_range, so only tabular pages reach camelot.
+    """
+    workers = workers or Config.PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or Config.PDF_PAGES_PER_CHUNK
+    route = Config.PDF_PAGE_ROUTER if route is None else route
+    extract = extract_routed_range if route else extract_page_range
+
+    total_pages = page_count(pdf_path)
+    ranges = page_ranges(total_pages, chunk_size)
+
+    if workers == 1 or len(ranges) == 1:
+        for pages in ranges:
+            yield from extract(pdf_path, pages, flavor)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=process_context()) as executor:
+        # map() yields in submission order, i.e. page order
+        for chunk in executor.map(extract, [pdf_path] * len(ranges), ranges, [flavor] * len(ranges)):
+            yield from chunk
+
+def extract_tables(pdf_path, workers=None, chunk_size=None, flavor="lattice", route=None):
+    """
+    Extract every table in a PDF as a list, in page order. See iter_tables.
+    """
+    return list(iter_tables(pdf_path, workers, chunk_size, flavor, route))
+
+def get_table_cache():
+    return TableCache(Config.TABLE_CACHE_DIR, Config.TABLE_CACHE_MAX_BYTES)
+
+def load_tables(pdf_path, extractor_cls, pdf_sha256=None, flavor="lattice", route=None, **kwargs):
+    """
+    Return the tables for a PDF, from the table cache when this exact file has
+    already been extracted for this extractor version, otherwise by running
+    extract_tables and caching the result. Extra kwargs go to extract_tables.
+    """
+    route = Config.PDF_PAGE_ROUTER if route is None else route
+    if not Config.TABLE_CACHE_ENABLED:
+        return extract_tables(pdf_path, flavor=flavor, route=route, **kwargs)
+
+    cache = get_table_cache()
+    key = cache.make_key(
+        pdf_sha256 or file_sha256(pdf_path),
+        f"extraction={EXTRACTION_VERSION}:{flavor}{':routed' if route else ''}",
+        f"{extractor_cls.__name__}={extractor_cls.VERSION}",
+    )
+    tables = cache.get(key)
+    if tables is None:
+        tables = extract_tables(pdf_path, flavor=flavor, route=route, **kwargs)
+        cache.put(key, tables)
+    return tables
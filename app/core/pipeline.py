@@ -0,0 +1,180 @@
+import contextvars
+import cProfile
+import datetime
+import os
+import shutil
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import Config, site_db_path, site_report_path
+from api.datto_client import iter_site_device_pages
+from core import metrics
+from core.database import init_database, open_database, reset_database
+from core.extractor_dispatcher import get_extractor
+from core.ingest import ingest_device_pages
+from core.pdf_tables import load_tables
+from core.queries import refresh_summaries
+from core.reconcile import reconcile_devices
+from core.report import build_report
+from core.snapshots import archive_site, site_trends
+from core.sync import sync_device_pages
+
+# Stages of a site report run, in order
+SITE_STAGES = ("devices", "pdfs", "report")
+
+# Only one run writes to a given database file at a time
+_db_locks = defaultdict(threading.Lock)
+_db_locks_guard = threading.Lock()
+
+# cProfile allows one active profiler per process (Python 3.12+), so profiled runs take turns
+_profile_lock = threading.Lock()
+
+def _db_lock(db_path):
+    with _db_locks_guard:
+        return _db_locks[os.path.abspath(db_path)]
+
+def _track_pages(job, pages):
+    devices = 0
+    for page in pages:
+        devices += len(page)
+        job.progress("devices", devices)
+        yield page
+
+@metrics.timed("stage_seconds", stage="devices")
+def sync_site_devices(site, db_path, job=None):
+    """
+    Pull the site's devices from Datto into the database, reporting progress
+    on the job's "devices" stage if a job is given, then rebuild the report
+    summary tables. Returns the ingest/sync summary.
+    """
+    pages = iter_site_device_pages(site)
+    if job:
+        job.start_stage("devices")
+        pages = _track_pages(job, pages)
+
+    with _db_lock(db_path):
+        if Config.INCREMENTAL_SYNC:
+            init_database(db_path)
+            with open_database(db_path) as conn:
+                summary = sync_device_pages(conn, pages)
+                refresh_summaries(conn)
+        else:
+            reset_database(db_path)
+            with open_database(db_path) as conn:
+                summary = ingest_device_pages(conn, pages)
+                refresh_summaries(conn)
+
+    if job:
+        job.finish_stage("devices")
+    return summary
+
+def _extract_pdf(path, pdf_sha256=None, workers=None):
+    # Tables for one PDF; runs on a parse_pdfs worker thread
+    extractor_cls = get_extractor(os.path.basename(path))
+    with metrics.timed("pdf_extract_seconds"):
+        return extractor_cls, load_tables(path, extractor_cls, pdf_sha256=pdf_sha256, workers=workers)
+
+@metrics.timed("stage_seconds", stage="pdfs")
+def parse_pdfs(job, pdf_paths, db_path=None, pdf_hashes=None):
+    """
+    Extract and parse each uploaded PDF, reporting progress on the "pdfs" stage.
+    With a db_path the parsed devices are reconciled into that database and
+    the report summaries rebuilt. A PDF that fails is recorded with its error
+    rather than failing the run.
+
+    Up to Config.PDF_CONCURRENCY PDFs have their tables extracted at once,
+    splitting the extraction workers between them. Parsing stays on this
+    thread: each PDF's devices stream from its tables into reconcile one at
+    a time, in upload order, so only tables wait in finished extractions.
+    pdf_hashes ({path: sha256}, known from the upload) saves hashing each
+    file again for the table cache.
+    """
+    job.start_stage("pdfs", total=len(pdf_paths))
+    pdf_hashes = pdf_hashes or {}
+    results = []
+
+    concurrency = max(1, min(Config.PDF_CONCURRENCY, len(pdf_paths)))
+    workers = max(1, (Config.PDF_EXTRACT_WORKERS or os.cpu_count() or 1) // concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Each task runs in its own copy of this context, so its metrics count towards the run
+        futures = [
+            executor.submit(contextvars.copy_context().run, _extract_pdf, path, pdf_hashes.get(path), workers)
+            for path in pdf_paths
+        ]
+        for index, (path, future) in enumerate(zip(pdf_paths, futures), start=1):
+            filename = os.path.basename(path)
+            try:
+                extractor_cls, tables = future.result()
+                devices = metrics.timed_iter(extractor_cls(path, tables).iter_devices(), "pdf_parse_seconds")
+                if db_path:
+                    with _db_lock(db_path), open_database(db_path) as conn:
+                        results.append({"file": filename, **reconcile_devices(conn, devices)})
+                else:
+                    devices = sum(1 for _ in devices)
+                    results.append({"file": filename, "devices": devices})
+            except Exception as e:
+                print(f"Failed to process {filename}: {e}")
+                results.append({"file": filename, "error": str(e)})
+            job.progress("pdfs", index)
+
+    if db_path and pdf_paths:
+        with _db_lock(db_path), open_database(db_path) as conn:
+            refresh_summaries(conn)
+
+    job.finish_stage("pdfs")
+    return results
+
+@metrics.timed("stage_seconds", stage="report")
+def write_report(job, site, db_path):
+    """
+    Snapshot the site's tables for this month, then build this month's Word
+    report with the trends across snapshots, on the "report" stage.
+    Returns (report path, snapshot summary).
+    """
+    job.start_stage("report", total=2)
+    period = datetime.date.today().strftime("%Y-%m")
+    snapshot = archive_site(site, db_path, period)
+    job.progress("report", 1)
+    path = build_report(db_path, site_report_path(site, period), site=site, period=period,
+                        trends=site_trends(site, Config.TREND_MONTHS))
+    job.progress("report", 2)
+    job.finish_stage("report")
+    return path, snapshot
+
+def _site_run(job, site, pdf_paths, db_path, pdf_hashes=None):
+    devices = sync_site_devices(site, db_path, job)
+    pdfs = parse_pdfs(job, pdf_paths, db_path, pdf_hashes)
+    report, snapshot = write_report(job, site, db_path)
+    return {"site": site, "devices": devices, "pdfs": pdfs, "report": report, "snapshot": snapshot}
+
+def run_site_report(job, site, pdf_paths, db_path=None, cleanup_dir=None, profile=False, pdf_hashes=None):
+    """
+    Job body for a full site run: API devices into the site's database, the
+    PDFs reconciled onto them, then the Word report. cleanup_dir (the job's
+    upload folder) is removed when the run ends. pdf_hashes maps each PDF
+    path to the SHA-256 taken while it was uploaded.
+
+    The run's timings are printed as one JSON line when it ends. With
+    profile=True it also runs under cProfile and the stats are saved to
+    Config.PROFILE_FOLDER/<job id>.prof, added to the result as "profile".
+    Profiled runs wait for each other, as only one profiler can be active.
+    """
+    db_path = db_path or site_db_path(site)
+    try:
+        with metrics.track_run("site_report", site=site, job=job.id):
+            if not profile:
+                return _site_run(job, site, pdf_paths, db_path, pdf_hashes)
+
+            profiler = cProfile.Profile()
+            profile_path = os.path.join(Config.PROFILE_FOLDER, f"{job.id}.prof")
+            with _profile_lock:
+                try:
+                    result = profiler.runcall(_site_run, job, site, pdf_paths, db_path, pdf_hashes)
+                finally:
+                    os.makedirs(Config.PROFILE_FOLDER, exist_ok=True)
+                    profiler.dump_stats(profile_path)
+            return {**result, "profile": profile_path}
+    finally:
+        if cleanup_dir:
+            shutil.rmtree(cleanup_dir, ignore_errors=True)
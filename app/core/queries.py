@@ -0,0 +1,232 @@
+"""
+Indexes, precomputed summary tables and the queries report sections read.
+
+Summaries are rebuilt by refresh_summaries() after each ingest, so a report
+section is a single indexed SELECT rather than a Python loop over devices.
+"""
+from core import metrics
+
+# Every child table is joined to devices on device_id
+DEVICE_CHILD_TABLES = (
+    "hardware", "storage", "software", "monitoring", "security_events", "backups",
+    "device_health", "patch_management", "lifecycle", "udfs",
+)
+
+INDEXES = [
+    *(f"CREATE INDEX IF NOT EXISTS idx_{table}_device_id ON {table} (device_id);" for table in DEVICE_CHILD_TABLES),
+    "CREATE INDEX IF NOT EXISTS idx_udfs_key ON udfs (key, device_id);",
+    "CREATE INDEX IF NOT EXISTS idx_devices_serial_number ON devices (serial_number);",
+    "CREATE INDEX IF NOT EXISTS idx_devices_name ON devices (name);",
+]
+
+# Storage rows at or above this usage are reported as outliers
+DISK_USAGE_OUTLIER_PERCENT = 90
+
+# One row per device with the fields most report sections need
+DEVICE_OVERVIEW_VIEW = """
+CREATE VIEW IF NOT EXISTS device_overview AS
+SELECT
+    d.id AS device_id,
+    d.uid,
+    d.name,
+    d.serial_number,
+    d.os_version,
+    d.last_user,
+    s.antivirus,
+    s.software_status,
+    p.patch_status,
+    p.patches_approved_pending,
+    p.patches_not_approved,
+    p.patches_installed,
+    l.warranty_date,
+    m.network_int_ip,
+    m.mac_address
+FROM devices d
+LEFT JOIN software s ON s.device_id = d.id
+LEFT JOIN patch_management p ON p.device_id = d.id
+LEFT JOIN lifecycle l ON l.device_id = d.id
+LEFT JOIN monitoring m ON m.device_id = d.id;
+"""
+
+# No antivirus product: no value, or the PDF's literal "None" (see summary_antivirus)
+MISSING_ANTIVIRUS = "COALESCE(NULLIF(antivirus, ''), 'None') = 'None'"
+
+SUMMARY_TABLES = {
+    "summary_patch_compliance": """
+        SELECT
+            COALESCE(NULLIF(patch_status, ''), 'Unknown') AS patch_status,
+            COUNT(*) AS devices,
+            SUM(CAST(COALESCE(patches_approved_pending, 0) AS INTEGER)) AS approved_pending,
+            SUM(CAST(COALESCE(patches_not_approved, 0) AS INTEGER)) AS not_approved
+        FROM devices d
+        LEFT JOIN patch_management p ON p.device_id = d.id
+        GROUP BY 1
+    """,
+    "summary_antivirus": """
+        SELECT
+            COALESCE(NULLIF(s.antivirus, ''), 'None') AS antivirus,
+            COUNT(*) AS devices
+        FROM devices d
+        LEFT JOIN software s ON s.device_id = d.id
+        GROUP BY 1
+    """,
+    "summary_warranty": """
+        SELECT
+            CASE
+                WHEN days IS NULL THEN 'Unknown'
+                WHEN days < 0 THEN 'Expired'
+                WHEN days <= 90 THEN '0-90 days'
+                WHEN days <= 180 THEN '91-180 days'
+                WHEN days <= 365 THEN '181-365 days'
+                ELSE 'Over 1 year'
+            END AS bucket,
+            COUNT(*) AS devices
+        FROM (
+            SELECT julianday(substr(l.warranty_date, 1, 10)) - julianday(:today) AS days
+            FROM devices d
+            LEFT JOIN lifecycle l ON l.device_id = d.id
+        )
+        GROUP BY 1
+    """,
+    "summary_disk_outliers": """
+        SELECT
+            d.id AS device_id,
+            d.name,
+            st.drive_letter,
+            st.disk_size,
+            st.disk_used,
+            CAST(REPLACE(st.disk_usage_percent, '%', '') AS REAL) AS usage_percent
+        FROM storage st
+        JOIN devices d ON d.id = st.device_id
+        WHERE CAST(REPLACE(st.disk_usage_percent, '%', '') AS REAL) >= :threshold
+    """,
+}
+
+# Stable ordering for the buckets when reading the warranty summary
+WARRANTY_BUCKETS = ("Expired", "0-90 days", "91-180 days", "181-365 days", "Over 1 year", "Unknown")
+
+def create_indexes(conn):
+    cursor = conn.cursor()
+    try:
+        for statement in INDEXES:
+            cursor.execute(statement)
+        cursor.execute(DEVICE_OVERVIEW_VIEW)
+        conn.commit()
+    finally:
+        cursor.close()
+
+def refresh_summaries(conn, today="now", threshold=DISK_USAGE_OUTLIER_PERCENT):
+    """
+    Rebuild every summary table from the current device data in one transaction.
+    `today` is the reference date for warranty buckets (YYYY-MM-DD or 'now').
+    """
+    create_indexes(conn)
+    params = {"today": today, "threshold": threshold}
+    with metrics.timed("sql_batch_seconds", operation="refresh_summaries"), conn:
+        for table, select in SUMMARY_TABLES.items():
+            conn.execute(f"DROP TABLE IF EXISTS {table};")
+            # CREATE TABLE ... AS can't take parameters, so fill an empty copy instead
+            conn.execute(f"CREATE TABLE {table} AS SELECT * FROM ({select}) WHERE 0;", params)
+            conn.execute(f"INSERT INTO {table} {select};", params)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_summary_disk_outliers_usage ON summary_disk_outliers (usage_percent DESC);")
+
+def _fetch_dicts(conn, sql, params=()):
+    cursor = conn.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+def patch_compliance(conn):
+    """
+    Devices per patch status, with pending/not-approved patch totals.
+    """
+    return _fetch_dicts(conn, "SELECT * FROM summary_patch_compliance ORDER BY devices DESC")
+
+def antivirus_coverage(conn):
+    """
+    Devices per antivirus product ('None' for devices without one), plus totals.
+    """
+    products = _fetch_dicts(conn, "SELECT * FROM summary_antivirus ORDER BY devices DESC")
+    total = sum(row["devices"] for row in products)
+    unprotected = sum(row["devices"] for row in products if row["antivirus"] == "None")
+    return {"total": total, "protected": total - unprotected, "unprotected": unprotected, "products": products}
+
+def warranty_buckets(conn):
+    """
+    Devices per warranty expiry bucket, in WARRANTY_BUCKETS order.
+    """
+    counts = {row["bucket"]: row["devices"] for row in _fetch_dicts(conn, "SELECT * FROM summary_warranty")}
+    return [{"bucket": bucket, "devices": counts.get(bucket, 0)} for bucket in WARRANTY_BUCKETS]
+
+def disk_usage_outliers(conn, limit=50):
+    """
+    The fullest disks at or above the outlier threshold, fullest first.
+    """
+    return _fetch_dicts(conn, "SELECT * FROM summary_disk_outliers ORDER BY usage_percent DESC LIMIT ?", (limit,))
+
+# Columns of device_overview the device browser can return
+DEVICE_FIELDS = (
+    "device_id", "uid", "name", "serial_number", "os_version", "last_user", "antivirus",
+    "software_status", "patch_status", "patches_approved_pending", "patches_not_approved",
+    "patches_installed", "warranty_date", "network_int_ip", "mac_address",
+)
+DEFAULT_DEVICE_FIELDS = ("device_id", "name", "os_version", "last_user", "patch_status", "antivirus", "warranty_date")
+MAX_DEVICE_PAGE = 500
+
+def _like(text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def browse_devices(conn, after=0, limit=50, fields=None, search=None, patch_status=None, antivirus=None):
+    """
+    One page of devices from device_overview, in device_id order.
+
+    Keyset paginated: pass the previous page's `next` as `after`, so every
+    page is a range scan on the primary key however deep it is. `fields`
+    picks columns (device_id is always included); `search` matches name,
+    serial or last user; `patch_status` matches the summary's statuses
+    (including 'Unknown'); `antivirus` is a product name or 'missing'.
+    Returns {"devices": [...], "next": cursor or None}.
+    """
+    fields = list(dict.fromkeys(["device_id", *(fields or DEFAULT_DEVICE_FIELDS)]))
+    unknown = [field for field in fields if field not in DEVICE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    limit = max(1, min(int(limit), MAX_DEVICE_PAGE))
+
+    where = ["device_id > :after"]
+    params = {"after": int(after or 0), "limit": limit + 1}
+    if search:
+        where.append("(name LIKE :search ESCAPE '\\' OR serial_number LIKE :search ESCAPE '\\' OR last_user LIKE :search ESCAPE '\\')")
+        params["search"] = _like(search)
+    if patch_status:
+        where.append("COALESCE(NULLIF(patch_status, ''), 'Unknown') = :patch_status")
+        params["patch_status"] = patch_status
+    if antivirus == "missing":
+        where.append(MISSING_ANTIVIRUS)
+    elif antivirus:
+        where.append("antivirus = :antivirus")
+        params["antivirus"] = antivirus
+
+    # One row past the page tells us whether there is another page
+    rows = _fetch_dicts(conn, f"""
+        SELECT {', '.join(fields)} FROM device_overview
+        WHERE {' AND '.join(where)}
+        ORDER BY device_id
+        LIMIT :limit
+    """, params)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {"devices": rows, "next": rows[-1]["device_id"] if more else None}
+
+def device_record(conn, device_id):
+    """
+    Everything stored for one device: its devices row plus the rows of each
+    child table, or None if there is no such device.
+    """
+    rows = _fetch_dicts(conn, "SELECT * FROM devices WHERE id = ?", (device_id,))
+    if not rows:
+        return None
+    record = rows[0]
+    for table in DEVICE_CHILD_TABLES:
+        record[table] = _fetch_dicts(conn, f"SELECT * FROM {table} WHERE device_id = ? ORDER BY id", (device_id,))
+    return record
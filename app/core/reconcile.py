@@ -0,0 +1,284 @@
+import difflib
+import re
+
+from config.config import Config
+from core import metrics
+from core.queries import create_indexes
+
+# Placeholder serials some vendors ship; they identify nothing
+JUNK_SERIALS = frozenset([
+    "", "0", "NONE", "N/A", "NA", "DEFAULTSTRING", "TOBEFILLEDBYOEM", "SYSTEMSERIALNUMBER",
+    "CHASSISSERIALNUMBER", "INVALID", "123456789", "0123456789",
+])
+
+# Matching strategies, tried in this order; each is a hash lookup
+MATCH_KEYS = ("serial", "hostname", "mac")
+
+# Hostnames at least this similar are accepted by the fuzzy fallback
+FUZZY_CUTOFF = 0.85
+
+# Fuzzy candidates come from the hostnames sharing this many of a leftover's rarest trigrams
+FUZZY_RARE_TRIGRAMS = 4
+
+def normalize_serial(value):
+    serial = re.sub(r"[\s\-_.]", "", str(value or "")).upper()
+    return "" if serial in JUNK_SERIALS else serial
+
+def normalize_hostname(value):
+    # The PDF can show a FQDN where the API has the short name
+    return str(value or "").strip().split(".")[0].lower()
+
+def normalize_mac(value):
+    mac = re.sub(r"[^0-9A-Fa-f]", "", str(value or "")).upper()
+    return mac if len(mac) == 12 and mac != "000000000000" else ""
+
+def _keys(serial, hostname, mac):
+    return {
+        "serial": normalize_serial(serial),
+        "hostname": normalize_hostname(hostname),
+        "mac": normalize_mac(mac),
+    }
+
+def _pdf_keys(device):
+    return _keys(device.serial_number, device.name, device.mac_address)
+
+def _trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class HostnameIndex:
+    """
+    Trigram index over hostnames for the fuzzy fallback.
+
+    Comparing every leftover with every unclaimed hostname is quadratic, so
+    each lookup only scores (with difflib) the hostnames that share one of
+    the query's rarest trigrams. A near-identical name shares most trigrams,
+    including rare ones, so it is almost always among them.
+    """
+    def __init__(self, names):
+        self.names = dict(names)
+        self.postings = {}
+        for name in self.names:
+            for gram in _trigrams(name):
+                self.postings.setdefault(gram, set()).add(name)
+
+    def remove(self, name):
+        del self.names[name]
+        for gram in _trigrams(name):
+            self.postings[gram].discard(name)
+
+    def closest(self, hostname, cutoff=FUZZY_CUTOFF):
+        """
+        Pop and return the id of the hostname most similar to `hostname`, or None.
+        """
+        grams = sorted((self.postings[gram] for gram in _trigrams(hostname) if self.postings.get(gram)), key=len)
+        candidates = sorted(set().union(*grams[:FUZZY_RARE_TRIGRAMS]))
+        close = difflib.get_close_matches(hostname, candidates, n=1, cutoff=cutoff)
+        if not close:
+            return None
+        device_id = self.names[close[0]]
+        self.remove(close[0])
+        return device_id
+
+def _value(value):
+    # A label the PDF shows with nothing after it parses as ""
+    return value if value not in ("", None) else None
+
+def _values(device, fields):
+    return tuple(_value(getattr(device, field)) for field in fields)
+
+HARDWARE_COLUMNS = ("processor", "ram", "motherboard", "bios_version", "display_adapter")
+STORAGE_COLUMNS = ("drive_letter", "disk_description", "disk_size", "disk_used", "disk_usage_percent")
+SECURITY_EVENT_COLUMNS = ("firewall_enabled", "defender_active", "last_scan")
+
+# PDF-only tables, replaced for every matched device: table -> (columns, row builder)
+PDF_TABLE_ROWS = {
+    "hardware": (HARDWARE_COLUMNS, lambda device: [_values(device, HARDWARE_COLUMNS)]),
+    "storage": (
+        STORAGE_COLUMNS,
+        lambda device: [tuple(_value(value) for value in disk) for disk in device.storage],
+    ),
+    "security_events": (
+        SECURITY_EVENT_COLUMNS,
+        lambda device: [
+            row for row in [_values(device, SECURITY_EVENT_COLUMNS)]
+            if any(value is not None for value in row)
+        ],
+    ),
+}
+
+# Rows the API sync owns, topped up in place with the fields only the PDF has.
+# PDF values win for PDF-only columns; API values are only filled when missing,
+# from the pdf_* copies sync falls back to (see API_PDF_FALLBACKS).
+PDF_UPDATES = {
+    "devices": (
+        """
+        UPDATE devices SET
+            architecture = COALESCE(?, architecture),
+            windows_key = COALESCE(?, windows_key),
+            last_reboot = COALESCE(?, last_reboot),
+            pdf_serial_number = COALESCE(?, pdf_serial_number),
+            serial_number = COALESCE(NULLIF(serial_number, ''), ?, pdf_serial_number)
+        WHERE id = ?
+        """,
+        lambda device: _values(device, ("architecture", "windows_key", "last_reboot", "serial_number", "serial_number")),
+    ),
+    "software": (
+        """
+        UPDATE software SET
+            office_key = COALESCE(?, office_key),
+            bitlocker_status = COALESCE(?, bitlocker_status),
+            pdf_antivirus = COALESCE(?, pdf_antivirus),
+            antivirus = COALESCE(NULLIF(antivirus, ''), ?, pdf_antivirus)
+        WHERE device_id = ?
+        """,
+        lambda device: _values(device, ("office_key", "bitlocker_status", "antivirus", "antivirus")),
+    ),
+    "monitoring": (
+        "UPDATE monitoring SET mac_address = COALESCE(?, mac_address) WHERE device_id = ?",
+        lambda device: _values(device, ("mac_address",)),
+    ),
+    "lifecycle": (
+        """
+        UPDATE lifecycle SET
+            warranty_status = COALESCE(?, warranty_status),
+            pdf_warranty_date = COALESCE(?, pdf_warranty_date),
+            warranty_date = COALESCE(NULLIF(warranty_date, ''), ?, pdf_warranty_date)
+        WHERE device_id = ?
+        """,
+        lambda device: _values(device, ("warranty_status", "warranty_date", "warranty_date")),
+    ),
+}
+
+class DeviceReconciler:
+    """
+    Matches parsed PDF devices to the site's API devices and writes the
+    PDF-only data onto them.
+
+    The database devices are indexed once by normalized serial number,
+    hostname and MAC address, so each PDF device costs a few dict lookups.
+    A key shared by several database devices is ambiguous and left out of
+    the index. Devices no key matches are held back and tried against the
+    still-unclaimed hostnames in finish(), so the fuzzy search only ever
+    sees the leftovers. Counts per strategy are kept in `counts`.
+    """
+    def __init__(self, conn):
+        # Every write below is keyed by device_id
+        create_indexes(conn)
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.index = {key: {} for key in MATCH_KEYS}
+        self.names = {}
+        rows = self.cursor.execute("""
+            SELECT d.id, d.name, d.serial_number, m.mac_address
+            FROM devices d
+            LEFT JOIN monitoring m ON m.device_id = d.id
+        """)
+        for device_id, name, serial, mac in rows:
+            for key, value in _keys(serial, name, mac).items():
+                if value:
+                    ids = self.index[key].setdefault(value, set())
+                    ids.add(device_id)
+            if name:
+                self.names[device_id] = normalize_hostname(name)
+        self.index = {
+            key: {value: next(iter(ids)) for value, ids in values.items() if len(ids) == 1}
+            for key, values in self.index.items()
+        }
+        self.claimed = set()
+        self.leftovers = []
+        self.counts = {**{key: 0 for key in MATCH_KEYS}, "fuzzy": 0, "unmatched": 0}
+
+    def _match(self, keys):
+        for key in MATCH_KEYS:
+            device_id = self.index[key].get(keys[key]) if keys[key] else None
+            if device_id is not None and device_id not in self.claimed:
+                return device_id, key
+        return None, None
+
+    def apply(self, devices):
+        """
+        Match one batch of PDF devices and write the matched ones in a single transaction.
+        """
+        matched = []
+        for device in devices:
+            device_id, key = self._match(_pdf_keys(device))
+            if device_id is None:
+                self.leftovers.append(device)
+                continue
+            self.claimed.add(device_id)
+            self.counts[key] += 1
+            matched.append((device_id, device))
+        self._write(matched)
+
+    def finish(self):
+        """
+        Fuzzy-match the leftovers by hostname, write them, and return the
+        counts with the devices that still matched nothing.
+        """
+        # Hostnames shared by several unclaimed devices can't identify one
+        unclaimed = {}
+        for device_id, name in self.names.items():
+            if device_id not in self.claimed:
+                unclaimed[name] = None if name in unclaimed else device_id
+        hostnames = HostnameIndex((name, device_id) for name, device_id in unclaimed.items() if device_id is not None)
+        matched = []
+        unmatched = []
+
+        for device in self.leftovers:
+            hostname = normalize_hostname(device.name)
+            device_id = hostnames.closest(hostname) if hostname else None
+            if device_id is not None:
+                self.claimed.add(device_id)
+                self.counts["fuzzy"] += 1
+                matched.append((device_id, device))
+            else:
+                unmatched.append({
+                    "device_name": device.name,
+                    "serial_number": device.serial_number,
+                    "mac_address": device.mac_address,
+                })
+
+        self._write(matched)
+        self.counts["unmatched"] = len(unmatched)
+        self.cursor.close()
+        return {**self.counts, "unmatched_devices": unmatched}
+
+    def _write(self, matched):
+        if not matched:
+            return
+
+        ids = [(device_id,) for device_id, _ in matched]
+        metrics.inc("sql_rows_total", len(matched), operation="reconcile")
+        with metrics.timed("sql_batch_seconds", operation="reconcile"), self.conn:
+            for sql, build in PDF_UPDATES.values():
+                self.cursor.executemany(sql, [(*build(device), device_id) for device_id, device in matched])
+            for table, (columns, build) in PDF_TABLE_ROWS.items():
+                placeholders = ", ".join("?" * (len(columns) + 1))
+                self.cursor.executemany(f"DELETE FROM {table} WHERE device_id = ?", ids)
+                self.cursor.executemany(
+                    f"INSERT INTO {table} (device_id, {', '.join(columns)}) VALUES ({placeholders})",
+                    [(device_id, *row) for device_id, device in matched for row in build(device)],
+                )
+
+def reconcile_devices(conn, devices, batch_size=None):
+    """
+    Reconcile an iterable of parsed PDF devices with the database in batches.
+    Returns {"devices", "serial", "hostname", "mac", "fuzzy", "unmatched", "unmatched_devices"}.
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    reconciler = DeviceReconciler(conn)
+    total = 0
+    batch = []
+
+    for device in devices:
+        total += 1
+        batch.append(device)
+        if len(batch) >= batch_size:
+            reconciler.apply(batch)
+            batch = []
+
+    if batch:
+        reconciler.apply(batch)
+
+    return {"devices": total, **reconciler.finish()}
@@ -0,0 +1,327 @@
+"""
+Word report generation from a site's database.
+
+Every section reads its rows through a cursor and writes them straight into
+table rows, so no section holds the site's devices in a list. Sections are
+independent: each is rendered in a worker process into its own copy of the
+template and handed back as XML, then the pieces are appended to the final
+document in SECTIONS order as they arrive.
+"""
+import datetime
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+
+from config.config import Config
+from core.database import open_database
+from core.pdf_tables import process_context
+from core.queries import (
+    MISSING_ANTIVIRUS, antivirus_coverage, disk_usage_outliers, patch_compliance, refresh_summaries, warranty_buckets,
+)
+
+TABLE_STYLE = "Table Grid"
+BULLET_STYLE = "List Bullet"
+EMPTY_TEXT = "No data available."
+
+# Template bytes by path, with the mtime they were read at
+_template_cache = {}
+_template_lock = threading.Lock()
+
+def _default_template():
+    from docx import Document
+    from docx.shared import Inches
+
+    document = Document()
+    if Config.REPORT_LOGO and os.path.exists(Config.REPORT_LOGO):
+        document.sections[0].header.paragraphs[0].add_run().add_picture(Config.REPORT_LOGO, height=Inches(0.6))
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def load_template(path=None):
+    """
+    The report template as .docx bytes. It is read once and only read again
+    when the file's mtime changes, so an updated template is picked up
+    without a restart. Bytes rather than a Document, so it can be handed to
+    the section workers and opened fresh for every document.
+    """
+    path = path or Config.REPORT_TEMPLATE
+    mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+
+    with _template_lock:
+        cached = _template_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        if mtime is None:
+            data = _default_template()
+        else:
+            with open(path, "rb") as file:
+                data = file.read()
+        _template_cache[path] = (mtime, data)
+        return data
+
+def _open_document(template):
+    from docx import Document
+
+    return Document(io.BytesIO(template))
+
+def _clear_body(document):
+    # Drop the template's own content but keep its page setup (sectPr)
+    body = document.element.body
+    for element in list(body):
+        if element is not body.sectPr:
+            body.remove(element)
+
+def _format_cell(value):
+    return "" if value is None else str(value)
+
+def _percent(part, total):
+    return f"{part * 100 / total:.0f}%" if total else "n/a"
+
+def _add_table(document, headers, rows, empty=EMPTY_TEXT):
+    """
+    Append a table with a header row and one row per item of `rows`, which
+    is consumed lazily (a cursor is fine). Adds `empty` as a paragraph
+    instead when there are no rows. Returns the number of rows written.
+    """
+    from copy import deepcopy
+    from docx.oxml.ns import qn
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        document.add_paragraph(empty)
+        return 0
+
+    table = document.add_table(rows=1, cols=len(headers))
+    try:
+        table.style = TABLE_STYLE
+    except KeyError:
+        pass  # branded templates may not define it
+    for cell, header in zip(table.rows[0].cells, headers):
+        cell.text = header
+        cell.paragraphs[0].runs[0].bold = True
+
+    # Building cells through python-docx costs a dozen element lookups each;
+    # copying a prepared row and filling in its text nodes is far cheaper
+    prototype = table.add_row()
+    for cell in prototype.cells:
+        cell.text = " "
+    prototype = prototype._tr
+    table._tbl.remove(prototype)
+    text_tag = qn("w:t")
+
+    count = 0
+    for row in chain([first], rows):
+        tr = deepcopy(prototype)
+        for node, value in zip(tr.iter(text_tag), row):
+            node.text = _format_cell(value)
+        table._tbl.append(tr)
+        count += 1
+    return count
+
+def _add_bullet(document, text):
+    try:
+        document.add_paragraph(text, style=BULLET_STYLE)
+    except KeyError:
+        document.add_paragraph(text)
+
+def _executive_summary(document, conn):
+    total = conn.execute("SELECT COUNT(*) FROM devices").fetchone()[0]
+    patched = sum(row["devices"] for row in patch_compliance(conn) if row["patch_status"] == "FullyPatched")
+    antivirus = antivirus_coverage(conn)
+    warranty = {row["bucket"]: row["devices"] for row in warranty_buckets(conn)}
+    outliers = conn.execute("SELECT COUNT(*) FROM summary_disk_outliers").fetchone()[0]
+
+    document.add_paragraph(f"This report covers {total} managed devices.")
+    _add_bullet(document, f"Fully patched: {patched} of {total} ({_percent(patched, total)})")
+    _add_bullet(document, f"Antivirus protected: {antivirus['protected']} of {total} ({_percent(antivirus['protected'], total)})")
+    _add_bullet(document, f"Warranty expired: {warranty['Expired']}, expiring within 90 days: {warranty['0-90 days']}")
+    _add_bullet(document, f"Disks at or above the usage threshold: {outliers}")
+
+def _endpoint_health(document, conn):
+    _add_table(document, ("Device", "Operating System", "Last User", "Serial Number", "IP Address"), conn.execute("""
+        SELECT name, os_version, last_user, serial_number, network_int_ip
+        FROM device_overview
+        ORDER BY name
+    """))
+
+def _patching(document, conn):
+    _add_table(
+        document,
+        ("Patch Status", "Devices", "Approved Pending", "Not Approved"),
+        ((row["patch_status"], row["devices"], row["approved_pending"], row["not_approved"]) for row in patch_compliance(conn)),
+    )
+    document.add_heading("Devices Needing Attention", level=2)
+    _add_table(document, ("Device", "Patch Status", "Approved Pending", "Not Approved"), conn.execute("""
+        SELECT name, patch_status, patches_approved_pending, patches_not_approved
+        FROM device_overview
+        WHERE COALESCE(patch_status, '') != 'FullyPatched'
+        ORDER BY name
+    """), empty="All devices are fully patched.")
+
+def _security(document, conn):
+    antivirus = antivirus_coverage(conn)
+    document.add_paragraph(
+        f"{antivirus['protected']} of {antivirus['total']} devices ({_percent(antivirus['protected'], antivirus['total'])}) "
+        f"report an antivirus product."
+    )
+    _add_table(document, ("Antivirus", "Devices"), ((row["antivirus"], row["devices"]) for row in antivirus["products"]))
+
+    document.add_heading("Unprotected Devices", level=2)
+    _add_table(document, ("Device", "Last User"), conn.execute(f"""
+        SELECT name, last_user
+        FROM device_overview
+        WHERE {MISSING_ANTIVIRUS}
+        ORDER BY name
+    """), empty="Every device reports an antivirus product.")
+
+    document.add_heading("BitLocker", level=2)
+    _add_table(document, ("Device", "BitLocker"), conn.execute("""
+        SELECT d.name, s.bitlocker_status
+        FROM devices d
+        JOIN software s ON s.device_id = d.id
+        WHERE s.bitlocker_status IS NOT NULL
+        ORDER BY d.name
+    """))
+
+def _backups(document, conn):
+    _add_table(document, ("Backup Status", "Devices"), conn.execute("""
+        SELECT COALESCE(NULLIF(backup_status, ''), 'Unknown'), COUNT(*)
+        FROM backups
+        GROUP BY 1
+        ORDER BY 2 DESC
+    """))
+    document.add_heading("Last Backup per Device", level=2)
+    _add_table(document, ("Device", "Status", "Last Backup", "Restore Events"), conn.execute("""
+        SELECT d.name, b.backup_status, b.last_backup, b.restore_events
+        FROM backups b
+        JOIN devices d ON d.id = b.device_id
+        ORDER BY d.name
+    """))
+
+def _storage(document, conn):
+    document.add_heading("Disks Near Capacity", level=2)
+    _add_table(
+        document,
+        ("Device", "Drive", "Size", "Used", "Used %"),
+        ((row["name"], row["drive_letter"], row["disk_size"], row["disk_used"], f"{row['usage_percent']:g}%")
+         for row in disk_usage_outliers(conn)),
+        empty="No disks are near capacity.",
+    )
+    document.add_heading("All Disks", level=2)
+    _add_table(document, ("Device", "Drive", "Size", "Used", "Used %"), conn.execute("""
+        SELECT d.name, st.drive_letter, st.disk_size, st.disk_used, st.disk_usage_percent
+        FROM storage st
+        JOIN devices d ON d.id = st.device_id
+        ORDER BY d.name, st.drive_letter
+    """))
+
+def _lifecycle(document, conn):
+    _add_table(document, ("Warranty", "Devices"), ((row["bucket"], row["devices"]) for row in warranty_buckets(conn)))
+    document.add_heading("Expired or Expiring Within 90 Days", level=2)
+    _add_table(document, ("Device", "Serial Number", "Warranty Date"), conn.execute("""
+        SELECT name, serial_number, warranty_date
+        FROM device_overview
+        WHERE julianday(substr(warranty_date, 1, 10)) - julianday('now') <= 90
+        ORDER BY warranty_date, name
+    """), empty="No warranties expire within 90 days.")
+
+# Report sections in document order: (heading, renderer)
+SECTIONS = (
+    ("Executive Summary", _executive_summary),
+    ("Device and Endpoint Health", _endpoint_health),
+    ("Patch Compliance", _patching),
+    ("Security Metrics", _security),
+    ("Backup and Continuity", _backups),
+    ("Storage", _storage),
+    ("Device Lifecycle", _lifecycle),
+)
+
+def _trends(document, trends):
+    document.add_heading("Trends", level=1)
+    document.add_heading("Patch Backlog", level=2)
+    _add_table(document, ("Month", "Devices", "Not Fully Patched", "Approved Pending", "Not Approved"), (
+        (row["period"], row["devices"], row["not_fully_patched"], row["approved_pending"], row["not_approved"])
+        for row in trends["patching"]
+    ))
+    document.add_heading("Disk Usage", level=2)
+    _add_table(document, ("Month", "Disks", "Used (GB)", "Size (GB)", "Near Capacity"), (
+        (row["period"], row["disks"], f"{row['used_gb']:g}", f"{row['size_gb']:g}", row["near_capacity"])
+        for row in trends["disks"]
+    ))
+    document.add_heading("Fastest Growing Disks", level=2)
+    _add_table(document, ("Device", "Drive", "First (GB)", "Latest (GB)", "Growth (GB)"), (
+        (row["name"], row["drive_letter"], f"{row['first_gb']:g}", f"{row['last_gb']:g}", f"{row['growth_gb']:g}")
+        for row in trends["disk_growth"]
+    ), empty="No disk growth over this period.")
+    document.add_heading("Warranty Expiry", level=2)
+    _add_table(document, ("Month", "Expired", "Expiring Within 90 Days"), (
+        (row["period"], row["expired"], row["expiring_90_days"]) for row in trends["warranty"]
+    ))
+
+def render_section(index, db_path, template):
+    """
+    Render SECTIONS[index] into a blank copy of the template and return its
+    body elements as XML strings. Runs in a worker process.
+    """
+    from lxml import etree
+
+    title, render = SECTIONS[index]
+    document = _open_document(template)
+    _clear_body(document)
+    document.add_heading(title, level=1)
+    with open_database(db_path) as conn:
+        render(document, conn)
+
+    body = document.element.body
+    return [etree.tostring(element) for element in body if element is not body.sectPr]
+
+def _has_summaries(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'summary_patch_compliance'").fetchone() is not None
+
+def build_report(db_path, output_path, site=None, period=None, workers=None, template_path=None, trends=None):
+    """
+    Write the .docx report for a site database to output_path and return the path.
+    period is "YYYY-MM" (the current month by default). Sections render on up
+    to `workers` processes (Config.REPORT_WORKERS, else one per CPU).
+    `trends` (from snapshots.site_trends) adds a month-over-month section.
+    """
+    from docx.oxml import parse_xml
+
+    template = load_template(template_path)
+    period = period or datetime.date.today().strftime("%Y-%m")
+    with open_database(db_path) as conn:
+        if not _has_summaries(conn):
+            refresh_summaries(conn)
+
+    document = _open_document(template)
+    document.add_heading("Monthly Cybersecurity Report", level=0)
+    if site:
+        document.add_paragraph(site)
+    document.add_paragraph(datetime.datetime.strptime(period, "%Y-%m").strftime("%B %Y"))
+    sect_pr = document.element.body.sectPr
+
+    def assemble(sections):
+        for elements in sections:
+            for xml in elements:
+                sect_pr.addprevious(parse_xml(xml))
+
+    workers = min(workers or Config.REPORT_WORKERS or os.cpu_count() or 1, len(SECTIONS))
+    indexes = range(len(SECTIONS))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as executor:
+            assemble(executor.map(render_section, indexes, repeat(db_path), repeat(template)))
+    else:
+        assemble(render_section(index, db_path, template) for index in indexes)
+    if trends and trends["periods"]:
+        _trends(document, trends)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = f"{output_path}.tmp"
+    document.save(temp_path)
+    os.replace(temp_path, output_path)
+    return output_path
@@ -0,0 +1,168 @@
+import bisect
+import os
+import threading
+import traceback
+
+import yaml
+
+from config.config import Config
+
+# libyaml's loader when available: several times faster on a long site list
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SiteIndex:
+    """
+    Search structures over a fixed list of site names.
+
+    Every word of every name (and the whole name) goes into one sorted list,
+    so prefix matches are a bisect; substrings of three or more characters
+    are narrowed down with a trigram index before being checked.
+    """
+    def __init__(self, names):
+        self.names = sorted(names, key=str.lower)
+        self.lowered = [name.lower() for name in self.names]
+        self.keys = sorted(
+            (key, position)
+            for position, lowered in enumerate(self.lowered)
+            for key in {lowered, *lowered.split()}
+        )
+        self.trigrams = {}
+        for position, lowered in enumerate(self.lowered):
+            for gram in _trigrams(lowered):
+                self.trigrams.setdefault(gram, set()).add(position)
+
+    def _prefixed(self, query):
+        positions = set()
+        for key, position in self.keys[bisect.bisect_left(self.keys, (query,)):]:
+            if not key.startswith(query):
+                break
+            positions.add(position)
+        return positions
+
+    def _containing(self, query):
+        if len(query) < 3:
+            return {position for position, lowered in enumerate(self.lowered) if query in lowered}
+        postings = sorted((self.trigrams.get(gram, set()) for gram in _trigrams(query)), key=len)
+        candidates = set.intersection(*postings) if postings else set()
+        return {position for position in candidates if query in self.lowered[position]}
+
+    def search(self, query, limit=20):
+        """
+        Names matching `query` (case-insensitive): names starting with it,
+        then names with a word starting with it, then names containing it,
+        each group alphabetical. Returns (names, total matches).
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.names[:limit], len(self.names)
+
+        prefixed = self._prefixed(query)
+        whole = {position for position in prefixed if self.lowered[position].startswith(query)}
+        containing = self._containing(query) - prefixed
+        ranked = sorted(whole) + sorted(prefixed - whole) + sorted(containing)
+        return [self.names[position] for position in ranked[:limit]], len(ranked)
+
+class SiteCatalog:
+    """
+    In-memory copy of the sites in config.yml.
+
+    The file is only parsed again when its mtime changes, so lookups cost
+    a stat. start_refresh() populates the file from the API on a
+    background thread, first when it is empty and then at an interval; the
+    catalog picks the change up through the mtime like any other edit.
+    """
+    def __init__(self, path=None):
+        self._path = path
+        self._mtime = None
+        self._sites = {}
+        self._index = SiteIndex([])
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self):
+        return self._path or Config.CONFIG_YAML
+
+    def _load(self):
+        try:
+            stat = os.stat(self.path)
+            mtime = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            mtime = None
+
+        with self._lock:
+            if mtime == self._mtime:
+                return self._sites, self._index
+
+            sites = {}
+            if mtime is not None:
+                try:
+                    with open(self.path, "r") as file:
+                        sites = (yaml.load(file, Loader=_Loader) or {}).get("sites") or {}
+                except Exception as e:
+                    print(f"Error loading {self.path}: {e}")
+            self._mtime = mtime
+            self._sites = sites
+            self._index = SiteIndex(sites)
+            return self._sites, self._index
+
+    def sites(self):
+        """
+        Site names, sorted case-insensitively.
+        """
+        return list(self._load()[1].names)
+
+    def get(self, name):
+        """
+        The config entry for a site ({"uid": ...}), or None.
+        """
+        return self._load()[0].get(name)
+
+    def __contains__(self, name):
+        return name in self._load()[0]
+
+    def __len__(self):
+        return len(self._load()[0])
+
+    def search(self, query, limit=20):
+        return self._load()[1].search(query, limit)
+
+    def start_refresh(self, interval, refresh):
+        """
+        Call refresh() (e.g. populate_sites) every `interval` seconds on a
+        daemon thread, straight away if the catalog is empty. With no
+        interval only that first fill of an empty catalog is done. Errors
+        are printed and retried at the next interval.
+        """
+        empty = not len(self)
+        with self._lock:
+            # Already running, or the one-off fill without an interval already tried
+            if self._thread and (self._thread.is_alive() or not interval):
+                return
+            if not interval and not empty:
+                return
+
+            def run():
+                wait = 0 if empty else interval
+                while not self._stop.wait(wait):
+                    try:
+                        refresh()
+                    except Exception:
+                        traceback.print_exc()
+                    if not interval:
+                        return
+                    wait = interval
+
+            self._stop.clear()
+            self._thread = threading.Thread(target=run, name="site-refresh", daemon=True)
+            self._thread.start()
+
+    def stop_refresh(self):
+        self._stop.set()
+
+# Shared catalog for the configured config.yml
+catalog = SiteCatalog()
@@ -0,0 +1,268 @@
+"""
+Monthly snapshots of a site's database, for trends across reports.
+
+The live database only holds the current state of a site. After each run
+the device tables are archived as one zip per month under
+Config.SNAPSHOT_FOLDER/<site>/YYYY-MM.zip, stored by column: every column
+is its own compressed member ("<table>/<column>.json"), next to a meta.json
+describing the tables. Columns with many repeated values (statuses, disk
+sizes, dates) are dictionary encoded as {"values": [...], "codes": [...]},
+the rest are plain JSON arrays. A trend query only decompresses the few
+columns it reads and parses each distinct value once, so a year of
+snapshots for thousands of devices is read quickly and none of it stays in
+SQLite.
+"""
+import datetime
+import json
+import os
+import re
+import zipfile
+
+from config.config import Config, site_snapshot_dir
+from core import metrics
+from core.database import open_database
+from core.queries import DEVICE_CHILD_TABLES, DISK_USAGE_OUTLIER_PERCENT
+
+FORMAT_VERSION = 1
+SNAPSHOT_TABLES = ("devices", *DEVICE_CHILD_TABLES)
+
+_PERIOD = re.compile(r"^\d{4}-\d{2}$")
+
+def _member(table, column):
+    return f"{table}/{column}.json"
+
+def _encode(values):
+    distinct = {}
+    codes = [distinct.setdefault(value, len(distinct)) for value in values]
+    if len(distinct) * 2 > len(codes):
+        return list(values)
+    return {"values": list(distinct), "codes": codes}
+
+def write_snapshot(conn, path, period, taken=None):
+    """
+    Archive SNAPSHOT_TABLES from `conn` to `path`, column by column. The
+    tables are read in one transaction, so the snapshot is consistent even
+    while another connection writes. Returns the snapshot's metadata.
+    """
+    taken = taken or datetime.datetime.now().isoformat(timespec="seconds")
+    meta = {"version": FORMAT_VERSION, "period": period, "taken": taken, "tables": {}}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+
+    conn.execute("BEGIN")
+    try:
+        with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+            for table in SNAPSHOT_TABLES:
+                cursor = conn.execute(f"SELECT * FROM {table} ORDER BY id")
+                columns = [column[0] for column in cursor.description]
+                rows = cursor.fetchall()
+                meta["tables"][table] = {"rows": len(rows), "columns": columns}
+                for column, values in zip(columns, zip(*rows) if rows else [()] * len(columns)):
+                    archive.writestr(_member(table, column), json.dumps(_encode(values), separators=(",", ":")))
+            archive.writestr("meta.json", json.dumps(meta, indent=2))
+    finally:
+        conn.rollback()
+
+    os.replace(temp_path, path)
+    return meta
+
+class Snapshot:
+    """
+    A snapshot file opened for reading. Columns are decompressed on demand.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._archive = zipfile.ZipFile(path)
+        self.meta = json.loads(self._archive.read("meta.json"))
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {path}: {self.meta.get('version')}")
+
+    @property
+    def period(self):
+        return self.meta["period"]
+
+    @property
+    def taken(self):
+        return self.meta["taken"]
+
+    def rows(self, table):
+        return self.meta["tables"].get(table, {}).get("rows", 0)
+
+    def column(self, table, column, convert=None):
+        """
+        All values of one column, in row order, passed through convert()
+        if given (called once per distinct value). Missing columns (from
+        older schemas) read as None for every row.
+        """
+        if column not in self.meta["tables"].get(table, {}).get("columns", ()):
+            return [convert(None) if convert else None] * self.rows(table)
+        data = json.loads(self._archive.read(_member(table, column)))
+        if isinstance(data, dict):
+            values = [convert(value) for value in data["values"]] if convert else data["values"]
+            return [values[code] for code in data["codes"]]
+        if convert:
+            converted = {}
+            return [converted[value] if value in converted else converted.setdefault(value, convert(value)) for value in data]
+        return data
+
+    def columns(self, table, *columns):
+        """
+        Rows of `table` as tuples of the requested columns.
+        """
+        return zip(*(self.column(table, column) for column in columns))
+
+    def close(self):
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def list_snapshots(site):
+    """
+    (period, path) of every snapshot kept for a site, oldest first.
+    """
+    folder = site_snapshot_dir(site)
+    if not os.path.isdir(folder):
+        return []
+    periods = sorted(name[:-4] for name in os.listdir(folder) if name.endswith(".zip") and _PERIOD.match(name[:-4]))
+    return [(period, os.path.join(folder, f"{period}.zip")) for period in periods]
+
+def prune_snapshots(site, keep):
+    """
+    Delete all but the newest `keep` snapshots of a site. Returns the
+    periods removed.
+    """
+    snapshots = list_snapshots(site)
+    expired = snapshots[:-keep] if keep else []
+    for _, path in expired:
+        os.remove(path)
+    return [period for period, _ in expired]
+
+def archive_site(site, db_path, period=None, retention=None):
+    """
+    Snapshot a site's database for `period` (this month by default),
+    replacing any earlier snapshot of the same month, then apply the
+    retention policy (Config.SNAPSHOT_RETENTION_MONTHS; None keeps all).
+    """
+    period = period or datetime.date.today().strftime("%Y-%m")
+    retention = Config.SNAPSHOT_RETENTION_MONTHS if retention is None else retention
+    path = os.path.join(site_snapshot_dir(site), f"{period}.zip")
+    with metrics.timed("snapshot_seconds", operation="write"), open_database(db_path) as conn:
+        meta = write_snapshot(conn, path, period)
+    pruned = prune_snapshots(site, retention)
+    return {"path": path, "period": period, "devices": meta["tables"]["devices"]["rows"], "pruned": pruned}
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+_SIZE = re.compile(r"([\d.,]+)\s*([KMGT]?B)?", re.IGNORECASE)
+_GIGABYTES = {"KB": 1 / 1024 ** 2, "MB": 1 / 1024, "GB": 1, "TB": 1024, "B": 1 / 1024 ** 3}
+
+def _gigabytes(value):
+    # Disk sizes are stored as report text, e.g. "476 GB" or "1.5 TB"
+    match = _SIZE.search(str(value or ""))
+    if not match:
+        return 0.0
+    try:
+        number = float(match.group(1).replace(",", ""))
+    except ValueError:
+        return 0.0
+    return number * _GIGABYTES.get((match.group(2) or "GB").upper(), 1)
+
+def _percent(value):
+    try:
+        return float(str(value).replace("%", ""))
+    except (TypeError, ValueError):
+        return None
+
+def _days_until(date_text, taken):
+    try:
+        return (datetime.date.fromisoformat(str(date_text)[:10]) - datetime.date.fromisoformat(taken[:10])).days
+    except ValueError:
+        return None
+
+def _patch_point(snapshot):
+    statuses = snapshot.column("patch_management", "patch_status")
+    return {
+        "devices": snapshot.rows("devices"),
+        "not_fully_patched": sum(1 for status in statuses if status != "FullyPatched"),
+        "approved_pending": sum(snapshot.column("patch_management", "patches_approved_pending", _int)),
+        "not_approved": sum(snapshot.column("patch_management", "patches_not_approved", _int)),
+    }
+
+def _disk_point(snapshot, threshold=DISK_USAGE_OUTLIER_PERCENT):
+    percents = snapshot.column("storage", "disk_usage_percent", _percent)
+    return {
+        "disks": snapshot.rows("storage"),
+        "size_gb": round(sum(snapshot.column("storage", "disk_size", _gigabytes)), 1),
+        "used_gb": round(sum(snapshot.column("storage", "disk_used", _gigabytes)), 1),
+        "near_capacity": sum(1 for percent in percents if (percent or 0) >= threshold),
+    }
+
+def _warranty_point(snapshot):
+    days = snapshot.column("lifecycle", "warranty_date", lambda date: _days_until(date, snapshot.taken))
+    return {
+        "expired": sum(1 for value in days if value is not None and value < 0),
+        "expiring_90_days": sum(1 for value in days if value is not None and 0 <= value <= 90),
+    }
+
+def _disk_usage_by_drive(snapshot):
+    # Keyed by device uid: ids are not stable across full reloads
+    uids = dict(snapshot.columns("devices", "id", "uid"))
+    hostnames = dict(snapshot.columns("devices", "uid", "name"))
+    usage = {}
+    storage = zip(
+        snapshot.column("storage", "device_id"),
+        snapshot.column("storage", "drive_letter"),
+        snapshot.column("storage", "disk_used", _gigabytes),
+    )
+    for device_id, drive, used in storage:
+        uid = uids.get(device_id)
+        if uid is not None:
+            usage[(uid, drive)] = used
+    return usage, hostnames
+
+def site_trends(site, months=12, growth_limit=10):
+    """
+    Month-by-month history for a site from its newest `months` snapshots,
+    oldest first: patch backlog, disk usage and warranty expiry per month,
+    plus the drives whose used space grew most over the window.
+    """
+    snapshots = list_snapshots(site)[-months:] if months else list_snapshots(site)
+    trends = {"periods": [], "patching": [], "disks": [], "warranty": [], "disk_growth": []}
+    first = last = None
+    with metrics.timed("snapshot_seconds", operation="trends"):
+        for period, path in snapshots:
+            with Snapshot(path) as snapshot:
+                trends["periods"].append(period)
+                trends["patching"].append({"period": period, **_patch_point(snapshot)})
+                trends["disks"].append({"period": period, **_disk_point(snapshot)})
+                trends["warranty"].append({"period": period, **_warranty_point(snapshot)})
+                if first is None:
+                    first = _disk_usage_by_drive(snapshot)
+                elif period == snapshots[-1][0]:
+                    last = _disk_usage_by_drive(snapshot)
+
+    if first and last:
+        (start, _), (end, hostnames) = first, last
+        growth = sorted(
+            ((end[key] - start[key], key) for key in end.keys() & start.keys()),
+            key=lambda item: (-item[0], item[1][0] or "", item[1][1] or ""),
+        )
+        trends["disk_growth"] = [
+            {
+                "name": hostnames.get(uid),
+                "drive_letter": drive,
+                "first_gb": round(start[(uid, drive)], 1),
+                "last_gb": round(end[(uid, drive)], 1),
+                "growth_gb": round(grown, 1),
+            }
+            for grown, (uid, drive) in growth[:growth_limit] if grown > 0
+        ]
+    return trends
@@ -0,0 +1,172 @@
+import hashlib
+import json
+
+from config.config import Config
+from core import metrics
+from core.database import (
+    API_CHILD_INSERTS, API_CHILD_UPDATES, API_DEVICE_COLUMNS, API_DEVICE_UPDATE,
+    _child_rows, _device_row, tune_for_bulk_load, write_transaction,
+)
+from core.ingest import prefetch
+from core.models import DeviceRecord
+
+# Every table holding per-device rows, deleted along with a device that left the site
+DEVICE_TABLES = (
+    "hardware", "storage", "software", "monitoring", "security_events", "backups",
+    "device_health", "patch_management", "lifecycle", "udfs", "row_hashes",
+)
+
+def _hash(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _child_hashes(child_rows):
+    # device_id is the first column of every child row and never part of the content
+    return {table: _hash([row[1:] for row in rows]) for table, rows in child_rows.items()}
+
+def _select_in(cursor, sql, values, chunk_size=500):
+    # sql has one "{}" for the IN list; chunked to stay under SQLite's bound-parameter limit
+    values = list(values)
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        yield from cursor.execute(sql.format(", ".join("?" * len(chunk))), chunk)
+
+class SiteSync:
+    """
+    Incrementally syncs a site's API devices into an existing database.
+
+    Each device record is hashed as a whole and each of its child tables separately.
+    Unchanged devices cost nothing but a hash, changed devices only have the
+    child tables whose hash moved rewritten, and devices not seen during the
+    run are deleted by finish(). Counts are kept in `counts`.
+
+    Rows that reconcile also writes to are updated in place, API columns only
+    (see API_CHILD_UPDATES), so the PDF data on them survives the next sync.
+    API values overwrite what is stored; where the API is empty, the columns
+    in API_PDF_FALLBACKS take the PDF's value rather than keeping the old one.
+
+    Each batch looks up its stored devices and allocates new ids inside its
+    own write transaction, so another process syncing the same site file
+    (the batch command alongside the web app) can't hand out the same ids.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.seen = set()
+        self.counts = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+
+    def apply(self, devices):
+        """
+        Sync one batch of DeviceRecords in a single transaction.
+        """
+        batch = []
+        for device in devices:
+            if device.uid in self.seen:
+                continue
+            self.seen.add(device.uid)
+            batch.append((device, _hash(device.values())))
+
+        inserts = []
+        updates = []
+        child_rows = {table: [] for table in API_CHILD_INSERTS}
+        child_updates = {table: [] for table in API_CHILD_UPDATES}
+        stale_children = {table: [] for table in API_CHILD_INSERTS}
+        hash_rows = []
+
+        with metrics.timed("sql_batch_seconds", operation="sync_devices"), write_transaction(self.conn):
+            known = {
+                uid: (device_id, content_hash)
+                for device_id, uid, content_hash in _select_in(
+                    self.cursor, "SELECT id, uid, content_hash FROM devices WHERE uid IN ({})", [device.uid for device, _ in batch],
+                )
+            }
+            table_hashes = {}
+            for device_id, table_name, row_hash in _select_in(
+                self.cursor, "SELECT device_id, table_name, hash FROM row_hashes WHERE device_id IN ({})",
+                [device_id for device_id, _ in known.values()],
+            ):
+                table_hashes.setdefault(device_id, {})[table_name] = row_hash
+            next_id = (self.cursor.execute("SELECT MAX(id) FROM devices").fetchone()[0] or 0) + 1
+
+            for device, content_hash in batch:
+                device_id, old_hash = known.get(device.uid, (None, None))
+                if device_id is not None and old_hash == content_hash:
+                    self.counts["unchanged"] += 1
+                    continue
+
+                is_new = device_id is None
+                if is_new:
+                    device_id = next_id
+                    next_id += 1
+                    inserts.append((device_id, *_device_row(device), content_hash))
+                    self.counts["inserted"] += 1
+                else:
+                    updates.append((*_device_row(device), content_hash, device_id))
+                    self.counts["updated"] += 1
+
+                rows = _child_rows(device_id, device)
+                old_table_hashes = table_hashes.get(device_id, {})
+                for table, new_hash in _child_hashes(rows).items():
+                    if old_table_hashes.get(table) == new_hash:
+                        continue
+                    if is_new:
+                        child_rows[table].extend(rows[table])
+                    elif table in API_CHILD_UPDATES:
+                        child_updates[table].extend((*row[1:], row[0]) for row in rows[table])
+                    else:
+                        stale_children[table].append((device_id,))
+                        child_rows[table].extend(rows[table])
+                    hash_rows.append((device_id, table, new_hash))
+
+            columns = ", ".join(API_DEVICE_COLUMNS)
+            self.cursor.executemany(
+                f"INSERT INTO devices (id, {columns}, content_hash) VALUES ({', '.join('?' * (len(API_DEVICE_COLUMNS) + 2))})",
+                inserts,
+            )
+            self.cursor.executemany(API_DEVICE_UPDATE, updates)
+            for table, sql in API_CHILD_UPDATES.items():
+                self.cursor.executemany(sql, child_updates[table])
+            for table, sql in API_CHILD_INSERTS.items():
+                self.cursor.executemany(f"DELETE FROM {table} WHERE device_id = ?", stale_children[table])
+                self.cursor.executemany(sql, child_rows[table])
+            self.cursor.executemany("INSERT OR REPLACE INTO row_hashes (device_id, table_name, hash) VALUES (?, ?, ?)", hash_rows)
+        metrics.inc("sql_rows_total", len(inserts) + len(updates), operation="sync_devices")
+
+    def finish(self):
+        """
+        Delete devices that were not part of this run and return the counts.
+        """
+        with metrics.timed("sql_batch_seconds", operation="delete_devices"), write_transaction(self.conn):
+            gone = [(device_id,) for device_id, uid in self.cursor.execute("SELECT id, uid FROM devices").fetchall() if uid not in self.seen]
+            for table in DEVICE_TABLES:
+                self.cursor.executemany(f"DELETE FROM {table} WHERE device_id = ?", gone)
+            self.cursor.executemany("DELETE FROM devices WHERE id = ?", gone)
+        metrics.inc("sql_rows_total", len(gone), operation="delete_devices")
+        self.counts["deleted"] = len(gone)
+        self.cursor.close()
+        return self.counts
+
+def sync_device_pages(conn, pages, batch_size=None):
+    """
+    Incrementally sync API device pages into the database, prefetching the
+    next page while the current batch is written.
+    Returns {"pages", "devices", "inserted", "updated", "unchanged", "deleted"}.
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    tune_for_bulk_load(conn)
+    sync = SiteSync(conn)
+    summary = {"pages": 0, "devices": 0}
+    batch = []
+
+    for page in prefetch(pages):
+        summary["pages"] += 1
+        summary["devices"] += len(page)
+        for api_data in page:
+            batch.append(DeviceRecord.from_api(api_data))
+            if len(batch) >= batch_size:
+                sync.apply(batch)
+                batch = []
+
+    if batch:
+        sync.apply(batch)
+
+    return {**summary, **sync.finish()}
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import pickle
+import uuid
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class TableCache:
+    """
+    On-disk cache of extracted PDF tables, keyed by content rather than filename.
+
+    Entries are pickled lists of ExtractedTable, which load in milliseconds.
+    The cache is capped at max_bytes; a hit refreshes the entry's mtime, and
+    the least recently used entries are evicted first when the cap is exceeded.
+    """
+    SUFFIX = ".tables"
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(pdf_sha256, *versions):
+        """
+        Cache key for a PDF's tables under the given extraction/parser versions,
+        so bumping either version transparently invalidates old entries.
+        """
+        return hashlib.sha256("|".join([pdf_sha256, *map(str, versions)]).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                tables = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            print(f"Discarding unreadable table cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return tables
+
+    def put(self, key, tables):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # Write to a unique temp name and rename, so readers never see a partial entry
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(self.SUFFIX):
+                    self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
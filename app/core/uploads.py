@@ -0,0 +1,119 @@
+"""
+Uploaded PDFs, streamed straight to disk.
+
+The multipart parser writes every uploaded file through an UploadStream:
+chunks go to a file under Config.UPLOAD_FOLDER as they arrive and are
+hashed on the way, so an upload is never held in memory and its SHA-256
+(the table cache key) is known without reading the file back. Saving it
+for a job is a rename. Files no job claimed are deleted when the request
+ends, and remove_stale() clears whatever a crash left behind.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+PART_SUFFIX = ".part"
+
+# The PDF header may follow a little leading junk, but must be in the first 1 KB
+PDF_MAGIC = b"%PDF-"
+HEAD_BYTES = 1024
+
+class UploadStream:
+    """
+    Writable, readable file for one upload that hashes what is written to it.
+    """
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix=PART_SUFFIX)
+        self._file = os.fdopen(fd, "w+b")
+        self._digest = hashlib.sha256()
+        self._kept = False
+        self.size = 0
+        self.head = b""
+
+    def write(self, data):
+        if len(self.head) < HEAD_BYTES:
+            self.head += data[:HEAD_BYTES - len(self.head)]
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read, seek, tell, close, ... come from the underlying file
+        return getattr(self._file, name)
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    @property
+    def is_pdf(self):
+        return PDF_MAGIC in self.head
+
+    def keep(self, path):
+        """
+        Move the finished upload to `path` (same filesystem, so no copy).
+        """
+        self._file.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.path, path)
+        self.path = path
+        self._kept = True
+        return path
+
+    def discard(self):
+        """
+        Close the upload and delete it unless keep() claimed it.
+        """
+        self._file.close()
+        if not self._kept:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+def save_upload(file, path, chunk_size=1024 * 1024):
+    """
+    Save a werkzeug FileStorage to `path` and return (sha256, is_pdf).
+    Uploads parsed through an UploadStream are moved into place; anything
+    else is copied across in chunks and hashed on the way.
+    """
+    stream = file.stream
+    if isinstance(stream, UploadStream):
+        stream.keep(path)
+        return stream.sha256, stream.is_pdf
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    head = b""
+    with open(path, "wb") as out:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            if len(head) < HEAD_BYTES:
+                head += chunk[:HEAD_BYTES - len(head)]
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest(), PDF_MAGIC in head
+
+def remove_stale(directory, max_age, now=None):
+    """
+    Delete entries (files or folders) directly under `directory` that were
+    last modified more than `max_age` seconds ago. Returns how many went.
+    """
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = (now or time.time()) - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,48 @@
+"""
+Wall-clock benchmark for get_device_audits against the local stub server.
+
+    python benchmarks/bench_device_audits.py --devices 500 --latency 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from config.config import Config
+from stub_datto_server import StubDattoServer, write_stub_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    with StubDattoServer(args.devices, args.latency, args.fail_rate) as server, tempfile.TemporaryDirectory() as tmp:
+        Config.CONFIG_YAML = os.path.join(tmp, "config.yml")
+        write_stub_config(Config.CONFIG_YAML, server)
+        Config.API_BACKOFF_FACTOR = 0.01
+        Config.TOKEN_CACHE_PATH = None
+
+        from api import datto_client
+
+        devices = [device["uid"] for device in server.state.devices]
+        print(f"{args.devices} devices, {args.latency * 1000:.0f} ms latency per request")
+        print(f"{'workers':>8} {'seconds':>9} {'audits/s':>9} {'failed':>7}")
+        for workers in args.workers:
+            Config.API_MAX_WORKERS = workers
+            datto_client._session = None  # resize the pool for this run
+            start = time.perf_counter()
+            audits, failures = datto_client.get_device_audits(devices, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>8} {elapsed:>9.2f} {len(audits) / elapsed:>9.1f} {len(failures):>7}")
+
+
+if __name__ == "__main__":
+    main()
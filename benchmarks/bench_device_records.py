@@ -0,0 +1,117 @@
+"""
+Per-device memory and construction cost of DeviceRecord vs the nested
+dicts both device paths used before it.
+
+PDF path: the extractor used to start every device from a ten-section dict
+literal full of "" placeholders; now it builds one slotted DeviceRecord.
+API path: the writers used to keep the raw API dicts (with their nested
+antivirus/patchManagement/udf dicts) for the whole batch; now each is
+turned into a record as it arrives and the raw dict is dropped.
+
+    python benchmarks/bench_device_records.py --devices 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.models import DeviceRecord, Disk
+from stub_datto_server import make_device
+
+
+def legacy_pdf_device(fields, storage):
+    # The extractor's old per-device template, filled the way it used to be
+    device = {
+        "device": {"device_name": "", "description": "", "domain": "", "last_user": "", "serial_number": "",
+                   "os_version": "", "architecture": "", "last_reboot": ""},
+        "hardware": {"cpu": "", "ram": "", "motherboard": "", "bios_version": "", "display_adapter": ""},
+        "software": {"office_key": "", "antivirus": "", "bitlocker_status": ""},
+        "monitoring": {"network_ext_ip": "", "network_int_ip": "", "mac_address": ""},
+        "security_events": {"firewall_enabled": "", "defender_active": "", "last_scan": ""},
+        "backups": {"backup_status": "", "last_backup": ""},
+        "device_health": {"status": "", "issues": ""},
+        "patch_management": {"pending_updates": "", "last_patch_date": ""},
+        "lifecycle": {"purchase_date": "", "warranty_date": "", "warranty_status": ""},
+        "storage": [],
+    }
+    for (section, field), value in fields:
+        device[section][field] = value
+    device["storage"] = [dict(zip(Disk._fields, disk)) for disk in storage]
+    return device
+
+
+def record_pdf_device(fields, storage):
+    return DeviceRecord(**{field: value for (_, field), value in fields}, storage=[Disk(*disk) for disk in storage])
+
+
+def pdf_fields(index):
+    # What the parser pulls out of one device's tables
+    legacy = [
+        (("device", "device_name"), f"WS-{index:06d}"), (("device", "serial_number"), f"SN{index:08d}"),
+        (("device", "os_version"), "Microsoft Windows 11 Pro"), (("device", "architecture"), "64-bit"),
+        (("device", "last_user"), f"STUB\\user{index % 250}"), (("device", "domain"), "STUB"),
+        (("hardware", "cpu"), "Intel(R) Core(TM) i7-1265U"), (("hardware", "ram"), "16 GB"),
+        (("software", "antivirus"), "Windows Defender"), (("monitoring", "mac_address"), f"00:11:22:33:{index >> 8 & 255:02X}:{index & 255:02X}"),
+        (("lifecycle", "warranty_date"), "2027-01-15"),
+    ]
+    renamed = {"device_name": "name", "cpu": "processor"}
+    current = [((section, renamed.get(field, field)), value) for (section, field), value in legacy]
+    storage = [("C:", "Local Fixed Disk", "476 GB", "400 GB", f"{index % 100}%")]
+    return legacy, current, storage
+
+
+def measure(build, inputs):
+    """
+    (seconds to build every device, bytes retained per device). Timed and
+    traced in separate passes, since tracing slows allocation down.
+    """
+    start = time.perf_counter()
+    devices = [build(*args) for args in inputs]
+    seconds = time.perf_counter() - start
+    del devices
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    devices = [build(*args) for args in inputs]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del devices
+    return seconds, retained / len(inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=10000)
+    args = parser.parse_args()
+    count = args.devices
+
+    pdf_inputs = [pdf_fields(index) for index in range(count)]
+    api_payloads = [json.dumps(make_device(index)) for index in range(count)]
+
+    results = {
+        "pdf: nested dict": measure(legacy_pdf_device, [(legacy, storage) for legacy, _, storage in pdf_inputs]),
+        "pdf: DeviceRecord": measure(record_pdf_device, [(current, storage) for _, current, storage in pdf_inputs]),
+        # The API path starts from the decoded page either way
+        "api: raw dict": measure(json.loads, [(payload,) for payload in api_payloads]),
+        "api: DeviceRecord": measure(lambda payload: DeviceRecord.from_api(json.loads(payload)), [(payload,) for payload in api_payloads]),
+    }
+
+    print(f"{count} devices")
+    print(f"{'':20} {'build ms':>9} {'us/device':>10} {'bytes/device':>13}")
+    for name, (seconds, per_device) in results.items():
+        print(f"{name:20} {seconds * 1000:>9.1f} {seconds * 1e6 / count:>10.2f} {per_device:>13.0f}")
+
+    for path in ("pdf", "api"):
+        (old_time, old_bytes), (new_time, new_bytes) = (
+            results[name] for name in results if name.startswith(path)
+        )
+        print(f"{path}: {old_bytes / new_bytes:.1f}x less memory per device, build time {new_time / old_time:.2f}x the nested dicts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Devices-per-second for the per-device insert path vs the bulk writer.
+
+    python benchmarks/bench_insert_devices.py --sizes 100 1000 10000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.database import create_tables, insert_device_from_api, insert_devices_from_api, tune_for_bulk_load
+from stub_datto_server import make_device
+
+
+def run_old(db_path, devices):
+    with sqlite3.connect(db_path) as conn:
+        create_tables(conn)
+        start = time.perf_counter()
+        for device in devices:
+            insert_device_from_api(conn, device)
+        return time.perf_counter() - start
+
+
+def run_new(db_path, devices):
+    with sqlite3.connect(db_path) as conn:
+        create_tables(conn)
+        start = time.perf_counter()
+        tune_for_bulk_load(conn)
+        insert_devices_from_api(conn, devices)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'devices':>8} {'old dev/s':>11} {'new dev/s':>11} {'speedup':>8}")
+    for size in args.sizes:
+        devices = [make_device(i) for i in range(size)]
+        with tempfile.TemporaryDirectory() as tmp:
+            old = run_old(os.path.join(tmp, "old.db"), devices)
+            new = run_new(os.path.join(tmp, "new.db"), devices)
+        print(f"{size:>8} {size / old:>11.0f} {size / new:>11.0f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
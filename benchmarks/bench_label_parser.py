@@ -0,0 +1,54 @@
+"""
+Per-row matching cost as the number of defined labels grows: the
+LabelMatcher dictionary lookup vs the sequential `"Label:" in row[0]`
+checks it replaced.
+
+    python benchmarks/bench_label_parser.py --fields 25 100 400 1600
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.extractors.detailed_computer_audit import FIELD_LABELS
+from core.extractors.label_parser import LabelMatcher
+from synthetic_pdf import device_tables
+
+
+def linear_match(labels, cell):
+    # The shape of the old elif chain: one substring test per known label
+    for needle, target in labels:
+        if needle in cell:
+            return target
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fields", type=int, nargs="+", default=[25, 100, 400, 1600])
+    parser.add_argument("--devices", type=int, default=50)
+    args = parser.parse_args()
+
+    cells = [row[0] for index in range(args.devices) for table in device_tables(index) for row in table]
+
+    print(f"{len(cells)} rows")
+    print(f"{'fields':>7} {'elif ns/row':>12} {'dict ns/row':>12}")
+    for count in args.fields:
+        # Real labels last, so the sequential scan pays for every extra field
+        filler = {f"Custom Field {n}": ("udf", f"field_{n}") for n in range(max(count - len(FIELD_LABELS), 0))}
+        labels = {**filler, **FIELD_LABELS}
+        matcher = LabelMatcher(labels)
+        ordered = [(f"{label}:", target) for label, target in labels.items()]
+
+        runs = 5
+        linear = timeit.timeit(lambda: [linear_match(ordered, cell) for cell in cells], number=runs)
+        lookup = timeit.timeit(lambda: [matcher.match(cell) for cell in cells], number=runs)
+        per_row = 1e9 / (runs * len(cells))
+        print(f"{len(labels):>7} {linear * per_row:>12.0f} {lookup * per_row:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
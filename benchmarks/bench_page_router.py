@@ -0,0 +1,60 @@
+"""
+Page-routed extraction vs running camelot on every page, on generated
+Detailed Computer Audit PDFs.
+
+The router classifies each page from its drawn rulings with pdfplumber,
+reads "Label: value" pages straight from the text layer and only sends
+pages with ruled multi-column tables (the disk drive tables) to camelot.
+Both layouts are measured: "ruled" (every section a ruled table, so every
+page still has a disk table for camelot) and "text" (sections as plain
+text, disk tables on their own pages). Devices are parsed with
+DetailedComputerAuditExtractor and compared against camelot on the ruled PDF.
+
+    python benchmarks/bench_page_router.py --devices 100 --workers 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.extractors.detailed_computer_audit import DetailedComputerAuditExtractor
+from core.pdf_tables import extract_tables
+from synthetic_pdf import write_pdf
+
+
+def run(pdf_path, route, workers):
+    start = time.perf_counter()
+    tables = extract_tables(pdf_path, workers=workers, route=route)
+    elapsed = time.perf_counter() - start
+    return DetailedComputerAuditExtractor(pdf_path, tables).parse(), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1, help="extraction processes; 1 runs in-process")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs = {
+            layout: write_pdf(os.path.join(tmp, f"Detailed Computer Audit {layout}.pdf"), args.devices, layout=layout)
+            for layout in ("ruled", "text")
+        }
+        reference = None
+        print(f"{args.devices} devices, {args.workers} worker(s)")
+        print(f"{'layout':>6} {'extraction':>11} {'seconds':>8} {'devices':>8} {'matches':>8}")
+        for layout, pdf_path in pdfs.items():
+            timings = {}
+            for name, route in (("camelot", False), ("router", True)):
+                devices, timings[name] = run(pdf_path, route, args.workers)
+                reference = reference or devices
+                print(f"{layout:>6} {name:>11} {timings[name]:>8.2f} {len(devices):>8} {str(devices == reference):>8}")
+            print(f"{layout:>6} {'speedup':>11} {timings['camelot'] / timings['router']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
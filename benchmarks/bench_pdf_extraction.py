@@ -0,0 +1,51 @@
+"""
+Page-sharded camelot extraction at different worker counts, on a generated
+multi-hundred-page Detailed Computer Audit PDF.
+
+    python benchmarks/bench_pdf_extraction.py --devices 300 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.pdf_tables import extract_tables
+from synthetic_pdf import write_pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=300, help="one page per device, plus a cover page")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--chunk-size", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = write_pdf(os.path.join(tmp, "Detailed Computer Audit.pdf"), args.devices)
+        print(f"{args.devices + 1} pages, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'seconds':>9} {'pages/s':>8} {'speedup':>8}")
+
+        baseline = None
+        reference = None
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            tables = extract_tables(pdf_path, workers=workers, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - start
+
+            # Every worker count must produce the same tables in the same order
+            signature = [(table.page, table.df.values.tolist()) for table in tables]
+            if reference is None:
+                reference = signature
+            elif signature != reference:
+                raise AssertionError(f"{workers} workers produced different tables than {sorted(args.workers)[0]}")
+
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {(args.devices + 1) / elapsed:>8.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
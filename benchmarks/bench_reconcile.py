@@ -0,0 +1,92 @@
+"""
+Time reconciling parsed PDF devices with a site's API devices, and check
+every device ends up where it should.
+
+The PDF devices are a mix of exact serial matches, placeholder serials that
+must fall back to the hostname, renamed hosts only the fuzzy pass can find,
+and devices the API doesn't know at all.
+
+    python benchmarks/bench_reconcile.py --sizes 1000 5000 20000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.database import create_tables, insert_devices_from_api, tune_for_bulk_load
+from core.models import DeviceRecord, Disk
+from core.reconcile import reconcile_devices
+from stub_datto_server import make_device
+
+
+def pdf_device(index):
+    """
+    A parsed device as the extractor yields it, and the strategy expected to match it.
+    """
+    device = DeviceRecord(
+        name=f"WS-{index:06d}",
+        serial_number=f"SN{index:08d}",
+        architecture="64-bit",
+        processor="Intel(R) Core(TM) i7-1265U",
+        ram="16 GB",
+        mac_address=f"00:11:22:{index >> 16 & 255:02X}:{index >> 8 & 255:02X}:{index & 255:02X}",
+        storage=[Disk("C:", "Local Fixed Disk", "476 GB", "400 GB", f"{index % 100}%")],
+    )
+
+    kind = index % 20
+    if kind < 14:
+        return device, "serial"
+    device.serial_number = "To Be Filled By O.E.M."
+    if kind < 17:
+        device.name += ".stub.local"
+        return device, "hostname"
+    if kind < 19:
+        device.name = f"WS{index:06d}"
+        return device, "fuzzy"
+    device.name = f"LAPTOP-{index:06d}"
+    device.mac_address = None
+    return device, "unmatched"
+
+
+def run(size):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "site.db"))
+        create_tables(conn)
+        tune_for_bulk_load(conn)
+        insert_devices_from_api(conn, [make_device(index) for index in range(size)])
+
+        devices, expected = zip(*(pdf_device(index) for index in range(size)))
+        start = time.perf_counter()
+        summary = reconcile_devices(conn, devices)
+        elapsed = time.perf_counter() - start
+
+        storage = conn.execute("SELECT COUNT(DISTINCT device_id) FROM storage").fetchone()[0]
+        conn.close()
+
+    counts = {key: expected.count(key) for key in ("serial", "hostname", "fuzzy", "unmatched")}
+    ok = all(summary[key] == count for key, count in counts.items()) and storage == size - counts["unmatched"]
+    return elapsed, summary, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    args = parser.parse_args()
+
+    print(f"{'devices':>8} {'seconds':>8} {'devices/s':>10}  serial/hostname/mac/fuzzy/unmatched")
+    failed = False
+    for size in args.sizes:
+        elapsed, summary, ok = run(size)
+        failed |= not ok
+        matches = "/".join(str(summary[key]) for key in ("serial", "hostname", "mac", "fuzzy", "unmatched"))
+        print(f"{size:>8} {elapsed:>8.3f} {size / elapsed:>10.0f}  {matches}{'' if ok else '  UNEXPECTED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
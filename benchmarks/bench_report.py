@@ -0,0 +1,83 @@
+"""
+Time .docx report generation for fixture site databases of several sizes,
+with sections rendered inline and on a process pool.
+
+    python benchmarks/bench_report.py --sizes 10 100 1000
+    python benchmarks/bench_report.py --sizes 1000 --keep report.docx
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.database import create_tables, insert_devices_from_api, tune_for_bulk_load
+from core.queries import refresh_summaries
+from core.reconcile import reconcile_devices
+from core.report import build_report, load_template
+from bench_reconcile import pdf_device
+from stub_datto_server import make_device
+
+
+def make_fixture(db_path, size):
+    """
+    A site database with API devices plus the PDF details reconciled onto them.
+    """
+    conn = sqlite3.connect(db_path)
+    create_tables(conn)
+    tune_for_bulk_load(conn)
+    insert_devices_from_api(conn, [make_device(index) for index in range(size)])
+    reconcile_devices(conn, (pdf_device(index)[0] for index in range(size)))
+    refresh_summaries(conn)
+    conn.close()
+
+
+def timed_build(db_path, output_path, workers):
+    start = time.perf_counter()
+    build_report(db_path, output_path, site="Stub Site", workers=workers)
+    return time.perf_counter() - start
+
+
+def peak_memory(db_path, output_path):
+    # Separate run: tracing allocations roughly doubles the build time
+    tracemalloc.start()
+    build_report(db_path, output_path, site="Stub Site", workers=1)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes for the parallel run")
+    parser.add_argument("--keep", help="copy the largest report here")
+    args = parser.parse_args()
+
+    load_template()  # read once up front, as the web app does on its first report
+    print(f"{'devices':>8} {'inline':>8} {'parallel':>9} {'peak MB':>8} {'size KB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db_path = os.path.join(tmp, f"site-{size}.db")
+            output_path = os.path.join(tmp, f"report-{size}.docx")
+            make_fixture(db_path, size)
+
+            inline = timed_build(db_path, output_path, workers=1)
+            parallel = timed_build(db_path, output_path, workers=args.workers)
+            peak = peak_memory(db_path, output_path)
+            print(f"{size:>8} {inline:>7.2f}s {parallel:>8.2f}s {peak / 2**20:>8.1f} {os.path.getsize(output_path) / 1024:>8.0f}")
+
+        if args.keep:
+            shutil.copy(output_path, args.keep)
+    if os.cpu_count() == 1:
+        print("(single CPU: the parallel run can't be faster here)")
+
+
+if __name__ == "__main__":
+    main()
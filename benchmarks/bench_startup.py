@@ -0,0 +1,107 @@
+"""
+Cold-start cost of the web app: import time (from -X importtime) and time
+to the first served request, each measured in a fresh interpreter.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --max-import 0.5   # exit 1 above 0.5s
+
+Fails (exit 1) if any heavy PDF/report dependency is imported at startup:
+those must only load when a PDF is processed or a report is built.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+
+# Modules that should stay out of startup
+HEAVY_MODULES = ("camelot", "pdfplumber", "pandas", "numpy", "cv2", "docx", "PyPDF2")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+from config.config import Config
+Config.CONFIG_YAML = {config!r}
+Config.TEMP_FOLDER = {temp!r}
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/")
+served = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"import": imported - start, "first_request": served - imported, "status": response.status_code, "heavy": heavy}}))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Top-level modules and their direct imports from -X importtime output,
+    as {name: cumulative seconds}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2  # nested imports are indented
+        if depth <= 1:
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def run_once(config_path, temp_dir):
+    probe = PROBE.format(app_dir=APP_DIR, config=config_path, temp=temp_dir, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True, cwd=APP_DIR)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {**timings, "wall": wall, "modules": parse_importtime(result.stderr)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    parser.add_argument("--max-import", type=float, help="fail if the median import time exceeds this (seconds)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, "config.yml")
+        with open(config_path, "w") as f:
+            f.write("api:\n  url: http://127.0.0.1:9\n  key: k\n  secret: s\nsites:\n  Example Site:\n    uid: example\n")
+        runs = [run_once(config_path, os.path.join(tmp, "temp")) for _ in range(args.runs)]
+
+    median = {key: statistics.median(run[key] for run in runs) for key in ("import", "first_request", "wall")}
+    print(f"import app:        {median['import'] * 1000:7.1f} ms (median of {args.runs})")
+    print(f"first request:     {median['first_request'] * 1000:7.1f} ms")
+    print(f"process wall time: {median['wall'] * 1000:7.1f} ms (interpreter start to exit)")
+
+    modules = runs[-1]["modules"]
+    print("\nslowest imports (cumulative):")
+    for name, seconds in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {seconds * 1000:7.1f} ms  {name}")
+
+    failed = False
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    if heavy:
+        print(f"\nFAILED: imported at startup: {', '.join(heavy)}")
+        failed = True
+    if any(run["status"] != 200 for run in runs):
+        print("\nFAILED: first request did not return 200")
+        failed = True
+    if args.max_import is not None and median["import"] > args.max_import:
+        print(f"\nFAILED: import took {median['import']:.3f}s, limit {args.max_import:.3f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Correctness check for incremental sync: sync a few stub devices, reconcile
+a PDF onto them, change and clear API values, re-sync, and verify the
+database holds what a full rebuild plus the same reconcile would.
+
+    python benchmarks/check_resync.py
+
+Exits non-zero on any mismatch.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.database import init_database, open_database, reset_database
+from core.models import DeviceRecord
+from core.reconcile import reconcile_devices
+from core.sync import sync_device_pages
+from stub_datto_server import make_device
+
+# What the site database is compared on: the API columns and the PDF-only ones
+CHECKED = """
+    SELECT d.uid, d.serial_number, s.antivirus, s.software_status, s.office_key,
+           l.warranty_date, l.warranty_status, m.network_ext_ip, m.mac_address
+    FROM devices d
+    JOIN software s ON s.device_id = d.id
+    JOIN lifecycle l ON l.device_id = d.id
+    JOIN monitoring m ON m.device_id = d.id
+    ORDER BY d.uid
+"""
+
+
+def pdf_devices(api_devices):
+    # The PDF knows every device, with its own antivirus and warranty date;
+    # device 2's PDF has no antivirus either
+    return [
+        DeviceRecord(
+            name=device["hostname"], serial_number=f"PDF-{index}", office_key=f"KEY-{index}",
+            antivirus=None if index == 2 else "PDF AV", warranty_date="2030-06-30", warranty_status="Active",
+            mac_address=f"00:11:22:33:44:{index:02x}",
+        )
+        for index, device in enumerate(api_devices)
+    ]
+
+
+def rows(db_path):
+    with open_database(db_path) as conn:
+        return conn.execute(CHECKED).fetchall()
+
+
+def main():
+    devices = [make_device(index) for index in range(3)]
+    for device in devices:
+        device["antivirus"]["antivirusProduct"] = "Sophos"
+        device["warrantyDate"] = "2027-01-01"
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        incremental = os.path.join(tmp, "incremental.db")
+        init_database(incremental)
+        with open_database(incremental) as conn:
+            sync_device_pages(conn, [devices])
+            reconcile_devices(conn, pdf_devices(devices))
+
+        # Device 0 loses its values in the API, device 1 only changes, device 2 is untouched
+        devices[0]["antivirus"]["antivirusProduct"] = None
+        devices[0]["warrantyDate"] = None
+        devices[0]["serialNumber"] = None
+        devices[1]["softwareStatus"] = "Changed"
+        with open_database(incremental) as conn:
+            counts = sync_device_pages(conn, [devices])
+        if (counts["updated"], counts["unchanged"]) != (2, 1):
+            failures.append(f"expected 2 updated and 1 unchanged, got {counts}")
+
+        # The cleared columns fall back to the PDF's values, not the old API ones
+        cleared = rows(incremental)[0]
+        expected = ("device-000000", "PDF-0", "PDF AV", "Not Compliant", "KEY-0", "2030-06-30", "Active")
+        if cleared[:7] != expected:
+            failures.append(f"cleared device: expected {expected}, got {cleared[:7]}")
+
+        rebuilt = os.path.join(tmp, "rebuilt.db")
+        reset_database(rebuilt)
+        with open_database(rebuilt) as conn:
+            sync_device_pages(conn, [devices])
+            reconcile_devices(conn, pdf_devices(devices))
+        for got, want in zip(rows(incremental), rows(rebuilt)):
+            if got != want:
+                failures.append(f"incremental {got} != rebuilt {want}")
+
+        # With no PDF run at all, a cleared API value leaves the column empty
+        api_only = os.path.join(tmp, "api_only.db")
+        init_database(api_only)
+        devices[0]["antivirus"]["antivirusProduct"] = "Sophos"
+        devices[0]["warrantyDate"] = "2027-01-01"
+        with open_database(api_only) as conn:
+            sync_device_pages(conn, [devices])
+        devices[0]["antivirus"]["antivirusProduct"] = None
+        devices[0]["warrantyDate"] = None
+        with open_database(api_only) as conn:
+            sync_device_pages(conn, [devices])
+        uid, serial, antivirus, _, _, warranty_date, *_ = rows(api_only)[0]
+        if (serial, antivirus, warranty_date) != (None, None, None):
+            failures.append(f"API-only re-sync kept {(serial, antivirus, warranty_date)} for {uid}")
+
+    if failures:
+        print("FAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("Re-sync overwrites cleared API values and matches a full rebuild.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Concurrency check for per-site storage: submit N site runs at once through
+the web app's job API, read every site database continuously while they
+ingest, and verify each database holds exactly its own site's devices.
+
+    python benchmarks/check_site_isolation.py --sites 8 --devices 2000
+
+Exits non-zero on any cross-talk or reader error.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from config.config import Config, site_db_path
+from run_benchmarks import isolate_config
+from stub_datto_server import SITE_UID, StubDattoServer
+
+
+def read_continuously(paths, stop, errors, reads):
+    # Readers must never be blocked or see errors while the ingest writers run (WAL)
+    while not stop.is_set():
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                conn = sqlite3.connect(path, timeout=0.1)
+                conn.execute("SELECT COUNT(*) FROM devices").fetchone()
+                conn.close()
+                reads[0] += 1
+            except sqlite3.OperationalError as e:
+                if "no such table" not in str(e):
+                    errors.append(f"{os.path.basename(path)}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sites", type=int, default=8)
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    with StubDattoServer(args.devices, args.latency, page_size=250, sites=args.sites) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        isolate_config(tmp, server)
+        Config.JOB_WORKERS = args.sites
+
+        import app as webapp
+        client = webapp.app.test_client()
+        sites = dict(server.state.sites)
+
+        stop = threading.Event()
+        errors, reads = [], [0]
+        paths = [site_db_path(site) for site in sites]
+        reader = threading.Thread(target=read_continuously, args=(paths, stop, errors, reads))
+        reader.start()
+
+        start = time.perf_counter()
+        job_ids = {site: client.post("/jobs", data={"site": site}).get_json()["job_id"] for site in sites}
+        for site, job_id in job_ids.items():
+            while client.get(f"/jobs/{job_id}").get_json()["status"] in ("queued", "running"):
+                time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        reader.join()
+
+        failures = list(errors)
+        for site, uid in sites.items():
+            status = client.get(f"/jobs/{job_ids[site]}/result").get_json()
+            if status["status"] != "done":
+                failures.append(f"{site}: job {status['status']} ({status.get('error')})")
+                continue
+            prefix = "device-" if uid == SITE_UID else f"{uid}-"
+            conn = sqlite3.connect(site_db_path(site))
+            uids = [row[0] for row in conn.execute("SELECT uid FROM devices")]
+            conn.close()
+            foreign = [device for device in uids if not device.startswith(prefix)]
+            if len(uids) != args.devices or foreign:
+                failures.append(f"{site}: {len(uids)} devices, {len(foreign)} from other sites")
+
+        print(f"{args.sites} sites x {args.devices} devices in {elapsed:.2f}s, {reads[0]} concurrent reads")
+        if failures:
+            print("FAILED:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("No cross-talk; readers never blocked.")
+
+
+if __name__ == "__main__":
+    main()
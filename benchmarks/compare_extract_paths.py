@@ -0,0 +1,56 @@
+"""
+Check that the row-loop and vectorized DetailedComputerAuditExtractor paths
+produce identical devices on a fixture PDF, and time both.
+
+    python benchmarks/compare_extract_paths.py --devices 200
+    python benchmarks/compare_extract_paths.py --pdf "path/to/Detailed Computer Audit.pdf"
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from core.extractors.detailed_computer_audit import DetailedComputerAuditExtractor
+from core.pdf_tables import extract_tables
+from synthetic_pdf import write_pdf
+
+
+def timed_parse(pdf_path, tables, vectorized):
+    start = time.perf_counter()
+    devices = DetailedComputerAuditExtractor(pdf_path, tables, vectorized=vectorized).parse()
+    return devices, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", help="existing audit PDF; a synthetic one is generated otherwise")
+    parser.add_argument("--devices", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf or write_pdf(os.path.join(tmp, "Detailed Computer Audit.pdf"), args.devices)
+        tables = extract_tables(pdf_path)
+
+    rows, rows_time = timed_parse(pdf_path, tables, vectorized=False)
+    vectorized, vectorized_time = timed_parse(pdf_path, tables, vectorized=True)
+
+    print(f"{len(tables)} tables, {len(rows)} devices")
+    print(f"row loop:   {rows_time:.3f}s")
+    print(f"vectorized: {vectorized_time:.3f}s ({rows_time / vectorized_time:.1f}x)")
+
+    for index, (expected, actual) in enumerate(zip(rows, vectorized)):
+        if expected != actual:
+            print(f"Device {index} differs:\n  row loop:   {expected}\n  vectorized: {actual}")
+            sys.exit(1)
+    if len(rows) != len(vectorized):
+        print(f"Device counts differ: {len(rows)} vs {len(vectorized)}")
+        sys.exit(1)
+    print("Results identical.")
+
+
+if __name__ == "__main__":
+    main()
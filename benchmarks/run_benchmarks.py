@@ -0,0 +1,228 @@
+"""
+Offline benchmark suite for the app's hot paths, written as one JSON file
+per run so results can be compared between versions.
+
+Everything runs against the local stub Datto server (stub_datto_server.py)
+and a generated Detailed Computer Audit PDF (synthetic_pdf.py), in a
+throwaway folder, so no credentials or client PDFs are needed. Timed:
+
+    get_devices_for_site    every device page for the site from the API
+    insert_device_from_api  the row-by-row writer, into an empty database
+    pdf_extract             camelot/pdfplumber tables for the PDF (no cache)
+    pdf_parse               get_extractor() plus parse() on those tables
+    index_post              POST / with the PDF, until its job has finished
+
+    python benchmarks/run_benchmarks.py --devices 500 --pdf-devices 50 --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+
+With --compare the run is checked against an earlier results file and the
+exit status is 1 if any benchmark got slower by more than --threshold.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from config.config import Config
+from stub_datto_server import SITE_NAME, StubDattoServer, write_stub_config
+from synthetic_pdf import write_pdf
+
+PDF_NAME = "Detailed Computer Audit.pdf"
+
+
+def measure(fn, repeat):
+    """
+    Run fn() `repeat` times; returns (stats, last result).
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    stats = {
+        "runs": repeat,
+        "median": round(statistics.median(times), 6),
+        "min": round(min(times), 6),
+        "max": round(max(times), 6),
+    }
+    return stats, result
+
+
+def isolate_config(tmp, server):
+    # Point every path the app writes to at the throwaway folder
+    Config.CONFIG_YAML = os.path.join(tmp, "config.yml")
+    write_stub_config(Config.CONFIG_YAML, server)
+    Config.TOKEN_CACHE_PATH = None
+    Config.TABLE_CACHE_ENABLED = False
+    Config.TABLE_CACHE_DIR = os.path.join(tmp, "temp", "table_cache")
+    Config.TEMP_FOLDER = os.path.join(tmp, "temp")
+    Config.UPLOAD_FOLDER = os.path.join(tmp, "temp", "uploads")
+    Config.JOB_UPLOAD_FOLDER = os.path.join(tmp, "temp", "jobs")
+    Config.PROFILE_FOLDER = os.path.join(tmp, "temp", "profiles")
+    Config.SITE_DB_FOLDER = os.path.join(tmp, "sites")
+    Config.REPORT_FOLDER = os.path.join(tmp, "reports")
+    Config.SNAPSHOT_FOLDER = os.path.join(tmp, "snapshots")
+
+
+def bench_api(repeat):
+    from api.datto_client import get_devices_for_site
+
+    stats, result = measure(lambda: get_devices_for_site(SITE_NAME), repeat)
+    return {**stats, "devices": len(result["devices"])}, result["devices"]
+
+
+def bench_insert(tmp, devices, repeat):
+    from core.database import init_database, insert_device_from_api, open_database
+
+    def insert():
+        db_path = os.path.join(tmp, "insert", f"{time.perf_counter_ns()}.db")
+        init_database(db_path)
+        with open_database(db_path) as conn, conn:
+            for api_data in devices:
+                insert_device_from_api(conn, api_data)
+
+    stats, _ = measure(insert, repeat)
+    return {**stats, "devices": len(devices)}
+
+
+def bench_pdf(pdf_path, repeat):
+    from core.extractor_dispatcher import get_extractor
+    from core.pdf_tables import load_tables
+
+    extractor_cls = get_extractor(os.path.basename(pdf_path))
+    extract, tables = measure(lambda: load_tables(pdf_path, extractor_cls), repeat)
+    parse, devices = measure(lambda: get_extractor(os.path.basename(pdf_path))(pdf_path, tables).parse(), repeat)
+    return {**extract, "tables": len(tables)}, {**parse, "devices": len(devices)}
+
+
+def bench_index_post(pdf_path, repeat, timeout=600):
+    import app as web
+
+    client = web.app.test_client()
+
+    def post():
+        with open(pdf_path, "rb") as pdf:
+            response = client.post("/", data={"site": SITE_NAME, "file": (pdf, PDF_NAME)}, content_type="multipart/form-data")
+        match = re.search(rb"/jobs/([0-9a-f]{32})", response.data)
+        if response.status_code != 200 or not match:
+            raise RuntimeError(f"POST / did not start a job (status {response.status_code})")
+        job = web.jobs.get(match.group(1).decode())
+        deadline = time.monotonic() + timeout
+        while job.active:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"job {job.id} did not finish in {timeout}s")
+            time.sleep(0.01)
+        if job.error:
+            raise RuntimeError(f"job {job.id} failed: {job.error}")
+        return job.result
+
+    stats, result = measure(post, repeat)
+    return {**stats, "pdf_devices": sum(pdf.get("devices", 0) for pdf in result["pdfs"])}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each benchmark's median against the baseline's; returns the names
+    that got slower by more than `threshold` (0.2 = 20%).
+    """
+    regressions = []
+    print(f"\nagainst {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}):")
+    for name, stats in results["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if not old:
+            print(f"{name:>24} {'new':>10}")
+            continue
+        ratio = stats["median"] / old["median"] if old["median"] else float("inf")
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:>24} {old['median']:>10.3f} -> {stats['median']:.3f}s {ratio:>6.2f}x {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=500, help="devices served by the stub API")
+    parser.add_argument("--pdf-devices", type=int, default=50, help="devices in the generated PDF")
+    parser.add_argument("--pdf-layout", choices=("ruled", "text"), default="ruled")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub API latency per request, in seconds")
+    parser.add_argument("--page-size", type=int, default=250, help="devices per stub API page")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the median is reported")
+    parser.add_argument("--skip", nargs="+", default=[], choices=("api", "insert", "pdf", "index"))
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown counted as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    results = {
+        "commit": commit,
+        "timestamp": timestamp,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "threshold")},
+        "benchmarks": {},
+    }
+    benchmarks = results["benchmarks"]
+
+    with StubDattoServer(args.devices, args.latency, page_size=args.page_size) as server, tempfile.TemporaryDirectory() as tmp:
+        isolate_config(tmp, server)
+        pdf_path = write_pdf(os.path.join(tmp, PDF_NAME), args.pdf_devices, layout=args.pdf_layout)
+
+        devices = None
+        if "api" not in args.skip:
+            benchmarks["get_devices_for_site"], devices = bench_api(args.repeat)
+        if "insert" not in args.skip:
+            if devices is None:
+                from api.datto_client import get_devices_for_site
+
+                devices = get_devices_for_site(SITE_NAME)["devices"]
+            benchmarks["insert_device_from_api"] = bench_insert(tmp, devices, args.repeat)
+        if "pdf" not in args.skip:
+            benchmarks["pdf_extract"], benchmarks["pdf_parse"] = bench_pdf(pdf_path, args.repeat)
+        if "index" not in args.skip:
+            benchmarks["index_post"] = bench_index_post(pdf_path, args.repeat)
+
+    print(f"{args.devices} API devices ({args.latency * 1000:.0f} ms latency), {args.pdf_devices} PDF devices, "
+          f"median of {args.repeat}, commit {commit or 'unknown'}")
+    for name, stats in benchmarks.items():
+        extra = ", ".join(f"{key} {value}" for key, value in stats.items() if key not in ("runs", "median", "min", "max"))
+        print(f"{name:>24} {stats['median']:>9.3f}s  (min {stats['min']:.3f}s)  {extra}")
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{timestamp.replace(':', '')}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(f"Slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Local stand-in for the Datto RMM API, used by the benchmarks.
+
+Serves the handful of endpoints the app talks to with synthetic data, with
+configurable device count, per-request latency and a rate of injected
+429 responses so retry handling can be exercised.
+
+Run standalone with:
+    python benchmarks/stub_datto_server.py --devices 500 --latency 0.05
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SITE_UID = "stub-site-0001"
+SITE_NAME = "Stub Site"
+
+
+def site_entries(count):
+    """
+    (name, uid) for each stub site; the first is always SITE_NAME/SITE_UID.
+    """
+    return [(SITE_NAME, SITE_UID)] + [(f"Stub Site {n}", f"stub-site-{n:04d}") for n in range(2, count + 1)]
+
+
+def make_device(index, prefix="device"):
+    return {
+        "uid": f"{prefix}-{index:06d}",
+        "hostname": f"WS-{index:06d}",
+        "description": f"Workstation {index}",
+        "lastLoggedInUser": f"STUB\\user{index % 250}",
+        "domain": "STUB",
+        "operatingSystem": "Microsoft Windows 11 Pro 23H2",
+        "serialNumber": f"SN{index:08d}",
+        "extIpAddress": "203.0.113.10",
+        "intIpAddress": f"10.0.{index // 250 % 256}.{index % 250 + 1}",
+        "warrantyDate": f"202{5 + index % 4}-0{1 + index % 9}-15",
+        "softwareStatus": "Compliant" if index % 7 else "Not Compliant",
+        "antivirus": {
+            "antivirusProduct": "Windows Defender" if index % 11 else None,
+            "antivirusStatus": "RunningAndUpToDate",
+        },
+        "patchManagement": {
+            "patchStatus": "FullyPatched" if index % 5 else "ApprovedPending",
+            "patchesApprovedPending": index % 5,
+            "patchesNotApproved": index % 3,
+            "patchesInstalled": 100 + index % 50,
+        },
+        "udf": {f"udf{n}": (f"value-{index}-{n}" if n <= 3 else None) for n in range(1, 31)},
+    }
+
+
+def make_audit(uid):
+    return {
+        "portalUrl": f"https://stub.local/device/{uid}",
+        "systemInfo": {"manufacturer": "Stub Computers", "model": "Model 9000", "totalPhysicalMemory": 17179869184},
+        "processors": [{"name": "Intel(R) Core(TM) i7-1265U"}],
+        "logicalDisks": [{"diskIdentifier": "C:", "freespace": 120000000000, "size": 512000000000}],
+        "networkInterfaces": [{"instance": "Realtek PCIe GbE", "macAddress": "00:11:22:33:44:55"}],
+    }
+
+
+class StubState:
+    def __init__(self, devices=100, latency=0.0, fail_rate=0.0, page_size=250, sites=1):
+        self.devices = [make_device(i) for i in range(devices)]
+        self.sites = site_entries(sites)
+        self._site_devices = {SITE_UID: self.devices}
+        self.page_size = page_size
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def site_devices(self, site_uid):
+        # Every extra site gets its own uids, so cross-site mix-ups are detectable
+        with self.lock:
+            if site_uid not in self._site_devices:
+                self._site_devices[site_uid] = [make_device(i, prefix=site_uid) for i in range(len(self.devices))]
+            return self._site_devices[site_uid]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is measurable
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _send_json(self, payload, status=200, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self):
+        # Returns False when this request should be answered with a 429
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        return random.random() >= self.state.fail_rate
+
+    def _device_page(self, path, site_devices):
+        # Mirrors Datto's paging: ?page=N&max=M with an absolute nextPageUrl
+        query = parse_qs(urlsplit(self.path).query)
+        page = int(query.get("page", ["0"])[0])
+        size = int(query.get("max", [str(self.state.page_size)])[0])
+        devices = site_devices[page * size:(page + 1) * size]
+        more = (page + 1) * size < len(site_devices)
+        host, port = self.server.server_address[:2]
+        next_url = f"http://{host}:{port}{path}?page={page + 1}&max={size}" if more else None
+        return {
+            "pageDetails": {"count": len(devices), "totalCount": len(site_devices), "nextPageUrl": next_url},
+            "devices": devices,
+        }
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self._simulate()
+        if self.path == "/auth/oauth/token":
+            self._send_json({"access_token": "stub-token", "token_type": "bearer", "expires_in": 360000})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_GET(self):
+        if not self._simulate():
+            self._send_json({"error": "rate limited"}, status=429, extra_headers={"Retry-After": "0"})
+            return
+
+        path = self.path.split("?", 1)[0]
+
+        if path == "/api/v2/account/sites":
+            self._send_json({"sites": [{"uid": uid, "name": name} for name, uid in self.state.sites]})
+            return
+
+        match = re.fullmatch(r"/api/v2/site/([^/]+)/devices", path)
+        if match:
+            self._send_json(self._device_page(path, self.state.site_devices(match.group(1))))
+            return
+
+        match = re.fullmatch(r"/api/v2/audit/device/([^/]+)", path)
+        if match:
+            self._send_json(make_audit(match.group(1)))
+            return
+
+        self._send_json({"error": "not found"}, status=404)
+
+
+class StubDattoServer:
+    """
+    Threaded stub server, usable as a context manager:
+
+        with StubDattoServer(devices=500, latency=0.02) as server:
+            requests.get(f"{server.url}/api/v2/account/sites")
+    """
+    def __init__(self, devices=100, latency=0.0, fail_rate=0.0, page_size=250, sites=1, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = StubState(devices, latency, fail_rate, page_size, sites)
+        self.thread = None
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def write_stub_config(path, server):
+    """
+    Write a config.yml pointing the app at the stub server.
+    """
+    import yaml
+
+    config = {
+        "api": {"url": server.url, "key": "stub-key", "secret": "stub-secret"},
+        "sites": {name: {"uid": uid} for name, uid in server.state.sites},
+    }
+    with open(path, "w") as f:
+        yaml.dump(config, f, sort_keys=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stub Datto API server.")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of GETs answered with 429")
+    parser.add_argument("--page-size", type=int, default=250, help="devices per site devices page")
+    parser.add_argument("--sites", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = StubDattoServer(args.devices, args.latency, args.fail_rate, args.page_size, args.sites, port=args.port)
+    print(f"Stub Datto API listening on {server.url} ({args.devices} devices)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,178 @@
+"""
+Generator for synthetic Datto "Detailed Computer Audit" PDFs.
+
+Writes a cover page followed by one page per device, each with ruled
+tables laid out the way DetailedComputerAuditExtractor expects: a
+"Device Information" table opening every device, then hardware,
+networking and disk drive tables. Plain PDF syntax, no dependencies.
+
+With layout="text" each device takes two pages instead: its "Label: value"
+sections printed as unruled text, then a page with the ruled disk drive
+table, for exercising the text/table page router.
+
+    python benchmarks/synthetic_pdf.py --devices 300 "Detailed Computer Audit.pdf"
+"""
+import argparse
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 40
+ROW_HEIGHT = 14
+TABLE_GAP = 16
+FONT_SIZE = 7
+
+
+def device_tables(index):
+    """
+    The tables for one device, as lists of rows (each row a list of cell strings).
+    """
+    name = f"WS-{index:06d}"
+    info = [
+        ["Device Information", ""],
+        [f"Device Name: {name}", f"Site: Stub Site"],
+        [f"Description: Workstation {index}", ""],
+        ["Domain: STUB", ""],
+        [f"Last User: STUB\\user{index % 250}", ""],
+        [f"Serial Number: SN{index:08d}", ""],
+        [f"Last Reboot: 2024-0{1 + index % 9}-1{index % 10} 08:30", ""],
+        ["Operating System: Microsoft Windows 11 Pro 23H2", ""],
+        ["OS Architecture: 64-bit", ""],
+        [f"Windows Activation Key: XXXXX-XXXXX-XXXXX-XXXXX-{index % 100000:05d}", ""],
+        [f"Office Activation Key: {'Not Activated' if index % 6 == 0 else 'XXXXX-' + str(index % 100000).zfill(5)}", ""],
+        [f"Antivirus Product: {'Windows Defender' if index % 11 else 'None'}", ""],
+        [f"BitLocker Detail: {'C: Protected' if index % 4 else 'C: Unprotected'}", ""],
+        [f"Warranty Date: 202{5 + index % 4}-0{1 + index % 9}-15", ""],
+        [f"Warranty Status: {'Active' if index % 3 else 'Expired'}", ""],
+    ]
+    hardware = [
+        ["Hardware", ""],
+        ["Processor: Intel(R) Core(TM) i7-1265U", ""],
+        [f"Memory: {8 * (1 + index % 4)} GB", ""],
+        ["Motherboard: Stub Computers 0A1B2C", ""],
+        [f"BIOS Name: 1.{index % 20}.0", ""],
+        ["Display Adapter", ""],
+        ["Intel(R) Iris(R) Xe Graphics", ""],
+    ]
+    if index % 5 == 0:
+        hardware.append(["NVIDIA T550 Laptop GPU", ""])
+    networking = [
+        ["Networking", ""],
+        ["Ext IP Address: 203.0.113.10", ""],
+        [f"Int IP Address: 10.0.{index // 250 % 256}.{index % 250 + 1}", ""],
+        ["MAC Address", f"00:11:22:{index >> 16 & 255:02X}:{index >> 8 & 255:02X}:{index & 255:02X}"],
+    ]
+    disks = [
+        ["Disk Drive", "", "", "", ""],
+        ["Drive", "Description", "Size", "Used", "Used %"],
+        ["C:", "Local Fixed Disk", "476 GB", f"{100 + index % 350} GB", f"{(100 + index % 350) * 100 // 476}%"],
+    ]
+    if index % 7 == 0:
+        disks.append(["D:", "Local Fixed Disk", "931 GB", "120 GB", "12%"])
+    return [info, hardware, networking, disks]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _table_ops(rows, top, ruled=True):
+    """
+    Content stream operators drawing a table whose top edge is at `top`,
+    ruled or as bare text in the same positions. Returns (operators, bottom).
+    """
+    columns = max(len(row) for row in rows)
+    width = PAGE_WIDTH - 2 * MARGIN
+    col_width = width / columns
+    bottom = top - ROW_HEIGHT * len(rows)
+    ops = ["0.5 w"]
+
+    # Grid lines: every row boundary and every column boundary
+    for r in range(len(rows) + 1 if ruled else 0):
+        y = top - r * ROW_HEIGHT
+        ops.append(f"{MARGIN} {y} m {MARGIN + width} {y} l S")
+    for c in range(columns + 1 if ruled else 0):
+        x = MARGIN + c * col_width
+        ops.append(f"{x:.2f} {top} m {x:.2f} {bottom} l S")
+
+    ops.append(f"BT /F1 {FONT_SIZE} Tf")
+    for r, row in enumerate(rows):
+        y = top - (r + 1) * ROW_HEIGHT + 4
+        for c, cell in enumerate(row):
+            if cell:
+                x = MARGIN + c * col_width + 3
+                ops.append(f"1 0 0 1 {x:.2f} {y} Tm ({_escape(cell)}) Tj")
+    ops.append("ET")
+    return ops, bottom
+
+
+def _page_stream(tables, ruled=True):
+    ops = []
+    top = PAGE_HEIGHT - MARGIN
+    for rows in tables:
+        table_ops, bottom = _table_ops(rows, top, ruled)
+        ops.extend(table_ops)
+        top = bottom - TABLE_GAP
+    return "\n".join(ops)
+
+
+def _device_streams(index, layout):
+    tables = device_tables(index)
+    if layout == "text":
+        return [_page_stream(tables[:-1], ruled=False), _page_stream(tables[-1:])]
+    return [_page_stream(tables)]
+
+
+def _cover_stream(devices):
+    return "\n".join([
+        "BT /F1 20 Tf 1 0 0 1 60 700 Tm (Detailed Computer Audit) Tj ET",
+        f"BT /F1 12 Tf 1 0 0 1 60 670 Tm (Stub Site - {devices} devices) Tj ET",
+    ])
+
+
+def write_pdf(path, devices, start=0, layout="ruled"):
+    """
+    Write a synthetic audit PDF for `devices` devices (one page each, two
+    with layout="text", plus a cover).
+    """
+    streams = [_cover_stream(devices)]
+    for i in range(devices):
+        streams.extend(_device_streams(start + i, layout))
+
+    # Object layout: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for stream in streams:
+        data = stream.encode("latin-1")
+        page_id = len(objects) + 1
+        page_ids.append(page_id)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode("latin-1")
+        )
+        objects.append(b"<< /Length " + str(len(data)).encode() + b" >>\nstream\n" + data + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Detailed Computer Audit PDF.")
+    parser.add_argument("path")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--layout", choices=("ruled", "text"), default="ruled")
+    args = parser.parse_args()
+    write_pdf(args.path, args.devices, layout=args.layout)
+    print(f"Wrote {args.devices} devices to {args.path}")